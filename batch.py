@@ -0,0 +1,140 @@
+import json
+import time
+
+# -----------------------------------------------------------------------------
+# Gemini Batch API Client
+# -----------------------------------------------------------------------------
+#
+# A batch run has three steps: write one generateContent request per line of
+# a JSONL file, upload it and submit it as a batch job, then poll the job and
+# download its JSONL results file.
+
+TERMINAL_STATES = {
+    "BATCH_STATE_SUCCEEDED",
+    "BATCH_STATE_FAILED",
+    "BATCH_STATE_CANCELLED",
+    "BATCH_STATE_EXPIRED",
+}
+
+class BatchError(Exception):
+    """Raised when a batch job cannot be submitted or does not succeed."""
+
+def write_batch_requests(filepath, keyed_payloads):
+    """
+    Serialize (key, generateContent payload) pairs into the batch JSONL
+    format, one {"key": ..., "request": ...} object per line.
+    Returns the number of requests written.
+    """
+    count = 0
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for key, payload in keyed_payloads:
+            f.write(json.dumps({"key": key, "request": payload}) + "\n")
+            count += 1
+    return count
+
+class BatchClient:
+    """Submits and tracks batch jobs over an existing requests.Session."""
+
+    def __init__(self, session, api_base, api_key, model_name):
+        self.session = session
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.model_name = model_name
+        # Uploads and downloads live under /upload/<version> and /download/<version>
+        root, version = self.api_base.rsplit("/", 1)
+        self.upload_base = f"{root}/upload/{version}"
+        self.download_base = f"{root}/download/{version}"
+
+    def upload_file(self, filepath, display_name):
+        """Upload a JSONL file with the resumable upload protocol; return its file name."""
+        with open(filepath, 'rb') as f:
+            data = f.read()
+
+        start = self.session.post(
+            f"{self.upload_base}/files",
+            params={"key": self.api_key},
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(len(data)),
+                "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+            },
+            data=json.dumps({"file": {"display_name": display_name}}),
+            timeout=30
+        )
+        start.raise_for_status()
+        upload_url = start.headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise BatchError("Upload start response did not include an upload URL")
+
+        finish = self.session.post(
+            upload_url,
+            headers={
+                "X-Goog-Upload-Command": "upload, finalize",
+                "X-Goog-Upload-Offset": "0",
+                "Content-Type": "application/jsonl",
+            },
+            data=data,
+            timeout=120
+        )
+        finish.raise_for_status()
+        return finish.json()["file"]["name"]
+
+    def create_batch(self, file_name, display_name):
+        """Create a batch job reading its requests from an uploaded file; return the job name."""
+        response = self.session.post(
+            f"{self.api_base}/models/{self.model_name}:batchGenerateContent",
+            params={"key": self.api_key},
+            data=json.dumps({
+                "batch": {
+                    "display_name": display_name,
+                    "input_config": {"file_name": file_name},
+                }
+            }),
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()["name"]
+
+    def get_batch(self, batch_name):
+        response = self.session.get(
+            f"{self.api_base}/{batch_name}",
+            params={"key": self.api_key},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def wait_for_batch(self, batch_name, poll_interval):
+        """Poll a batch job until it reaches a terminal state and return it."""
+        while True:
+            batch = self.get_batch(batch_name)
+            state = batch.get("metadata", {}).get("state", "BATCH_STATE_UNSPECIFIED")
+            if state in TERMINAL_STATES:
+                if state != "BATCH_STATE_SUCCEEDED":
+                    raise BatchError(f"Batch {batch_name} ended in state {state}: {batch.get('error')}")
+                return batch
+            print(f"Batch {batch_name} is {state}; checking again in {poll_interval}s...")
+            time.sleep(poll_interval)
+
+    def iter_results(self, batch):
+        """
+        Download a finished batch's results file and yield
+        (key, response, error) for each line; one of response/error is None.
+        """
+        responses_file = batch.get("response", {}).get("responsesFile")
+        if not responses_file:
+            raise BatchError(f"Batch {batch.get('name')} has no responses file")
+
+        with self.session.get(
+            f"{self.download_base}/{responses_file}:download",
+            params={"key": self.api_key, "alt": "media"},
+            timeout=120,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield record.get("key"), record.get("response"), record.get("error")
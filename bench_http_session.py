@@ -0,0 +1,83 @@
+import argparse
+import json
+import shutil
+import statistics
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+
+import main
+from stub_server import start_stub_server
+
+# -----------------------------------------------------------------------------
+# Benchmark: one-off requests.post vs the pooled keep-alive session
+# -----------------------------------------------------------------------------
+#
+# Sends the same generateContent payload to a local stand-in server, first
+# with a fresh connection per request (the old behaviour) and then through
+# main.create_http_session, and reports per-request latency for both.
+
+def build_payload(name, domain):
+    return {
+        "contents": [{"parts": [{"text": f"Find all major-specific and general transfer prerequisites "
+                                          f"for {name} using the search domain {domain}. "}]}],
+    }
+
+def time_requests(send, count, concurrency):
+    """Run `count` calls to send(i) across `concurrency` threads; return latencies."""
+    def timed(i):
+        start = time.perf_counter()
+        send(i)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, range(count)))
+
+def summarize(label, latencies, wall):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(f"{label:<22} mean {statistics.mean(ordered) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(ordered) * 1000:7.2f} ms   "
+          f"p95 {p95 * 1000:7.2f} ms   wall {wall:6.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-request connections with a pooled session.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="Server-side delay per response")
+    parser.add_argument("--no-tls", action="store_true", help="Use plain HTTP instead of a self-signed HTTPS stub")
+    args = parser.parse_args()
+
+    use_tls = not args.no_tls and shutil.which("openssl") is not None
+    server = start_stub_server(latency=args.latency, tls=use_tls)
+    url = f"{server.base_url}/models/{main.MODEL_NAME}:generateContent?key=bench"
+
+    # The stub's certificate is self-signed
+    warnings.simplefilter("ignore", urllib3.exceptions.InsecureRequestWarning)
+
+    def body(i):
+        return json.dumps(build_payload(f"University {i}", f"www.u{i}.edu"))
+
+    def send_fresh(i):
+        response = requests.post(url, headers={'Content-Type': 'application/json'},
+                                 data=body(i), timeout=30, verify=False)
+        response.raise_for_status()
+
+    session = main.create_http_session(args.concurrency)
+
+    def send_pooled(i):
+        response = session.post(url, data=body(i), timeout=30, verify=False)
+        response.raise_for_status()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"{'HTTPS' if use_tls else 'HTTP'} stub at {server.base_url}")
+    for label, send in (("requests.post", send_fresh), ("pooled session", send_pooled)):
+        start = time.perf_counter()
+        latencies = time_requests(send, args.requests, args.concurrency)
+        summarize(label, latencies, time.perf_counter() - start)
+
+    session.close()
+    server.shutdown()
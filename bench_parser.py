@@ -0,0 +1,78 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from report_parser import GeneralInfo, Major, University, parse_files
+
+# -----------------------------------------------------------------------------
+# Benchmark: parsing a large corpus of delimited reports
+# -----------------------------------------------------------------------------
+#
+# Builds a synthetic corpus by copying the sample reports in colleges/ under
+# new university names, then parses all of it with report_parser and reports
+# throughput and peak Python memory. Peak memory should stay flat as the
+# corpus grows, since only one block is held at a time.
+
+def build_corpus(sample_paths, directory, count):
+    """Write `count` reports to `directory`, cycling through the samples. Returns total bytes."""
+    samples = []
+    for path in sample_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            samples.append(f.read())
+
+    total_bytes = 0
+    for i in range(count):
+        text = samples[i % len(samples)]
+        name_start = text.find("NAME: ")
+        if name_start != -1:
+            name_end = text.find("\n", name_start)
+            text = f"{text[:name_start]}NAME: Synthetic University {i}{text[name_end:]}"
+        path = os.path.join(directory, f"Synthetic University {i}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        total_bytes += len(text.encode('utf-8'))
+    return total_bytes
+
+def parse_corpus(paths):
+    counts = {University: 0, GeneralInfo: 0, Major: 0}
+    for record in parse_files(paths):
+        counts[type(record)] += 1
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure report_parser throughput and memory.")
+    parser.add_argument("--reports", type=int, default=20000, help="Reports in the synthetic corpus")
+    parser.add_argument("--samples", default="colleges", help="Directory of sample reports to copy")
+    args = parser.parse_args()
+
+    sample_paths = sorted(glob.glob(os.path.join(args.samples, "*.txt")))
+    if not sample_paths:
+        print(f"FATAL: No sample reports found in {args.samples}/")
+        exit()
+
+    directory = tempfile.mkdtemp(prefix="report_corpus_")
+    try:
+        total_bytes = build_corpus(sample_paths, directory, args.reports)
+        paths = sorted(glob.glob(os.path.join(directory, "*.txt")))
+        print(f"{len(paths)} reports ({total_bytes / 1e6:.1f} MB) built from {len(sample_paths)} samples")
+
+        start = time.perf_counter()
+        counts = parse_corpus(paths)
+        elapsed = time.perf_counter() - start
+        print(f"Parsed {counts[University]} universities, {counts[GeneralInfo]} general blocks, "
+              f"{counts[Major]} majors in {elapsed:.2f} s")
+        print(f"  {len(paths) / elapsed:,.0f} reports/s   {total_bytes / 1e6 / elapsed:.1f} MB/s")
+
+        # Separate pass: tracemalloc slows parsing down considerably
+        for size in (len(paths) // 10, len(paths)):
+            tracemalloc.start()
+            parse_corpus(paths[:size])
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  peak Python memory over {size} reports: {peak / 1024:.0f} KiB")
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,82 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+from segment_log import SegmentLog
+
+# -----------------------------------------------------------------------------
+# Benchmark: one file per report vs. the append-only segment log
+# -----------------------------------------------------------------------------
+#
+# Writes the sample reports in colleges/ `--rounds` times under new names,
+# once as individual files (what save_report does with --sink text) and once
+# into a SegmentLog, then reads every report back from each. Point --dir at
+# a network filesystem to see the difference the open/close per file makes.
+
+def load_samples(directory):
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            samples.append(f.read())
+    return samples
+
+def write_files(directory, reports):
+    for name, report in reports:
+        with open(os.path.join(directory, name + ".txt"), 'w', encoding='utf-8') as f:
+            f.write(report)
+
+def read_files(directory, names):
+    total = 0
+    for name in names:
+        with open(os.path.join(directory, name + ".txt"), 'r', encoding='utf-8') as f:
+            total += len(f.read())
+    return total
+
+def write_log(directory, reports):
+    log = SegmentLog(directory)
+    for name, report in reports:
+        log.append(name, report)
+    log.close()
+
+def read_log(directory, names):
+    log = SegmentLog(directory)
+    total = 0
+    for name in names:
+        total += len(log.read(name))
+    log.close()
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-file report writes with the segment log.")
+    parser.add_argument("--rounds", type=int, default=200, help="Copies of each sample report to write")
+    parser.add_argument("--samples", default="colleges", help="Directory of sample reports to copy")
+    parser.add_argument("--dir", default=None, help="Where to write (default: a temporary directory)")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        print(f"FATAL: No sample reports found in {args.samples}/")
+        exit()
+    reports = [(f"University {i}", samples[i % len(samples)]) for i in range(args.rounds * len(samples))]
+    names = [name for name, _ in reports]
+    total_mb = sum(len(report.encode('utf-8')) for _, report in reports) / 1e6
+    print(f"{len(reports)} reports, {total_mb:.1f} MB")
+
+    root = tempfile.mkdtemp(prefix="segment_bench_", dir=args.dir)
+    try:
+        for label, write, read in (("files", write_files, read_files), ("segment log", write_log, read_log)):
+            directory = os.path.join(root, label.replace(" ", "_"))
+            os.makedirs(directory)
+            start = time.perf_counter()
+            write(directory, reports)
+            written = time.perf_counter() - start
+            start = time.perf_counter()
+            read(directory, names)
+            read_time = time.perf_counter() - start
+            print(f"  {label:<12} write {len(reports) / written:>9,.0f} reports/s   "
+                  f"read {len(reports) / read_time:>9,.0f} reports/s")
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,150 @@
+import io
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+from fan_out import FAILED_MAJORS_STATUS
+
+# -----------------------------------------------------------------------------
+# Report Checkpoints
+# -----------------------------------------------------------------------------
+#
+# Every report starts with a small header written by main.py:
+#
+#   --- UNIVERSITY_START ---
+#   NAME: Baylor University
+#   DOMAIN: www.baylor.edu
+#   REPORT_DATE: 2025-11-08 14:28:06
+#   STATUS: FAILED - <error>        (failure records only)
+#   STATUS: INCOMPLETE - <reason>   (reports cut off at the output limit,
+#                                    or fanned out with failed majors)
+#
+# Reading just these lines is enough to decide whether a run can skip a
+# university. JSON reports (--json) carry the same fields as lowercase keys.
+
+REPORT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+HEADER_KEYS = ("NAME", "DOMAIN", "REPORT_DATE", "STATUS")
+
+def read_report_header(file_path):
+    """
+    Parse the header fields of a report file into a dict, or return None if
+    the file is missing or does not start with a UNIVERSITY_START header
+    (or, for a .json report, is not a JSON object).
+    """
+    if file_path.endswith(".json"):
+        return read_json_header(file_path)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return header_from_lines(f)
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def read_json_header(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return header_from_json(report)
+
+def parse_report_header(text):
+    """Like read_report_header, for a report (delimited text or JSON) already in memory."""
+    if text.lstrip().startswith("{"):
+        try:
+            return header_from_json(json.loads(text))
+        except ValueError:
+            return None
+    return header_from_lines(io.StringIO(text))
+
+def header_from_lines(lines):
+    lines = iter(lines)
+    if next(lines, "").strip() != "--- UNIVERSITY_START ---":
+        return None
+    header = {}
+    for line in lines:
+        key, sep, value = line.partition(":")
+        if not sep or key not in HEADER_KEYS:
+            break
+        header[key] = value.strip()
+    return header
+
+def header_from_json(report):
+    if not isinstance(report, dict):
+        return None
+    return {key: str(report[key.lower()]) for key in HEADER_KEYS if key.lower() in report}
+
+def is_failed(header):
+    return header.get("STATUS", "").startswith("FAILED")
+
+def has_failed_majors(header):
+    """True for a fanned-out report saved with some majors failed (see fan_out.py)."""
+    return bool(FAILED_MAJORS_STATUS.match(header.get("STATUS", "")))
+
+def report_age(header, now=None):
+    """Age of a report as a timedelta, or None if REPORT_DATE is unreadable."""
+    try:
+        report_date = datetime.strptime(header.get("REPORT_DATE", ""), REPORT_DATE_FORMAT)
+    except ValueError:
+        return None
+    return (now or datetime.now()) - report_date
+
+def is_fresh(header, max_age, now=None):
+    """True for a successful, complete report generated within `max_age`."""
+    if header is None or "STATUS" in header:
+        return False
+    age = report_age(header, now)
+    return age is not None and age <= max_age
+
+def pending_universities(universities, header_for, max_age_hours):
+    """
+    Filter a university list down to the entries without a fresh, successful
+    report. `header_for` maps a university name to its report header (e.g.
+    read_report_header of its file), or None if it has no report.
+    """
+    max_age = timedelta(hours=max_age_hours)
+    now = datetime.now()
+    return [
+        uni for uni in universities
+        if not is_fresh(header_for(uni['college_name']), max_age, now)
+    ]
+
+# -----------------------------------------------------------------------------
+# Failure Records
+# -----------------------------------------------------------------------------
+
+# Checked in order; the first matching pattern names the failure class
+FAILURE_PATTERNS = (
+    ("rate_limited", re.compile(r"\b429\b|Too Many Requests|RESOURCE_EXHAUSTED", re.IGNORECASE)),
+    ("timeout", re.compile(r"timed out|timeout", re.IGNORECASE)),
+    ("server_error", re.compile(r"\b5\d\d Server Error|\bUNAVAILABLE\b|\bINTERNAL\b")),
+)
+
+def classify_failure(status):
+    """Map a STATUS: FAILED message to 'rate_limited', 'timeout', 'server_error' or 'other'."""
+    for failure_class, pattern in FAILURE_PATTERNS:
+        if pattern.search(status):
+            return failure_class
+    return "other"
+
+def group_failures(headers):
+    """
+    Group the headers of failure records by failure class, and those of
+    fanned-out reports with failed majors under 'failed_majors'; other
+    headers are ignored. Returns {failure_class: [header, ...]}.
+    """
+    failures = {}
+    for header in headers:
+        if not header or not header.get("NAME") or not header.get("DOMAIN"):
+            continue
+        if is_failed(header):
+            failures.setdefault(classify_failure(header["STATUS"]), []).append(header)
+        elif has_failed_majors(header):
+            failures.setdefault("failed_majors", []).append(header)
+    return failures
+
+def read_report_headers(directory, extension=".txt"):
+    """Headers of the report files in `directory` ending in `extension`, in name order."""
+    for entry in sorted(os.listdir(directory)):
+        if entry.endswith(extension):
+            yield read_report_header(os.path.join(directory, entry))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# Circuit Breaker
+# -----------------------------------------------------------------------------
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit is open."""
+
+class CircuitBreaker:
+    """
+    Stops traffic to an endpoint that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens: requests
+    are refused with CircuitOpenError and `try_dispatch` holds back new work.
+    Once `reset_timeout` seconds have passed, a single probe is let through
+    (half-open). Its success closes the circuit; its failure opens it again.
+    `is_failure(error)` decides which errors count against the endpoint.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0, is_failure=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda error: True)
+        self.state = CLOSED
+        self.trips = 0
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def seconds_until_probe(self):
+        """Time left before an open circuit lets a probe through (0 if not open)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def try_dispatch(self):
+        """
+        True if new work may start now. When an open circuit's timeout has
+        elapsed, the first caller becomes the half-open probe.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                print("Circuit breaker half-open; sending a probe request...")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                print("Circuit breaker closed; resuming dispatch.")
+            self.state = CLOSED
+            self._consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.trips += 1
+                self._opened_at = time.monotonic()
+                print(f"⚠️  Circuit breaker open after {self._consecutive_failures} consecutive failures; "
+                      f"pausing dispatch for {self.reset_timeout:g}s.")
+
+    def call(self, fn):
+        """Run `fn` through the breaker, refusing it while the circuit is open."""
+        with self._lock:
+            if self.state == OPEN:
+                raise CircuitOpenError("Circuit breaker is open")
+        try:
+            result = fn()
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
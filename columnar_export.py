@@ -0,0 +1,210 @@
+import argparse
+import os
+import time
+from datetime import datetime
+
+from checkpoint import REPORT_DATE_FORMAT
+from report_parser import GeneralInfo, Major, University, course_codes
+from storage import DEFAULT_DB_FILENAME, ReportStore, read_report_records, report_records
+from search_index import report_files
+from normalize import NAT, NormalizedTable, day_to_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+# -----------------------------------------------------------------------------
+# Columnar Export (Parquet / Arrow IPC)
+# -----------------------------------------------------------------------------
+#
+# Writes the reports as four tables for analytics tools:
+#
+#   universities/  one row per report: header fields plus the normalize.py
+#                  columns (min_gpa, fall_deadline, spring_deadline,
+#                  max_transfer_units)
+#   general_info/  (university_id, position, key, value)
+#   majors/        (major_id, university_id, name, selectivity, minimum_grade, courses)
+#   courses/       (code, major_id, university_id)
+#
+# Each table is a hive-partitioned dataset (report_month=2025-11/...), so a
+# dashboard can read one month, and only the columns it needs. Strings that
+# repeat a lot (status, keys, major names, selectivity, grades, course codes)
+# are dictionary-encoded; Parquet stores the dictionary once per column
+# chunk and readers get them back as dictionary arrays.
+#
+# Requires pyarrow (pip install pyarrow).
+#
+#   python columnar_export.py colleges/ --out analytics/
+#   python columnar_export.py --db reports.db --out analytics/ --format arrow
+
+DICTIONARY_COLUMNS = {
+    "universities": ("status", "report_month"),
+    "general_info": ("key", "report_month"),
+    "majors": ("name", "selectivity", "minimum_grade", "report_month"),
+    "courses": ("code", "report_month"),
+}
+UNKNOWN_MONTH = "unknown"
+
+class ColumnarTables:
+    """Column lists for the four tables, filled one report at a time."""
+
+    def __init__(self):
+        self.universities = {
+            "university_id": [], "name": [], "domain": [], "report_date": [], "status": [], "report_month": [],
+        }
+        self.general_info = {"university_id": [], "position": [], "key": [], "value": [], "report_month": []}
+        self.majors = {
+            "major_id": [], "university_id": [], "name": [], "selectivity": [], "minimum_grade": [],
+            "courses": [], "report_month": [],
+        }
+        self.courses = {"code": [], "major_id": [], "university_id": [], "report_month": []}
+        self.normalized = NormalizedTable()
+
+    def add_report(self, records):
+        university = general_info = None
+        for record in records:
+            if isinstance(record, University):
+                if university is not None:
+                    self.normalized.append(university, general_info)
+                university, general_info = record, None
+                self._add_university(record)
+            elif university is None:
+                continue
+            elif isinstance(record, GeneralInfo):
+                general_info = general_info or record
+                self._add_general_info(record)
+            elif isinstance(record, Major):
+                self._add_major(record)
+        if university is not None:
+            self.normalized.append(university, general_info)
+
+    def _add_university(self, university):
+        try:
+            report_date = datetime.strptime(university.report_date or "", REPORT_DATE_FORMAT)
+        except ValueError:
+            report_date = None
+        columns = self.universities
+        self._university_id = len(columns["university_id"])
+        self._month = report_date.strftime("%Y-%m") if report_date else UNKNOWN_MONTH
+        columns["university_id"].append(self._university_id)
+        columns["name"].append(university.name)
+        columns["domain"].append(university.domain)
+        columns["report_date"].append(report_date)
+        columns["status"].append(university.status)
+        columns["report_month"].append(self._month)
+        self._position = 0
+
+    def _add_general_info(self, general_info):
+        columns = self.general_info
+        for position, (key, value) in enumerate(general_info.fields, self._position):
+            columns["university_id"].append(self._university_id)
+            columns["position"].append(position)
+            columns["key"].append(key)
+            columns["value"].append(value)
+            columns["report_month"].append(self._month)
+        self._position += len(general_info.fields)
+
+    def _add_major(self, major):
+        columns = self.majors
+        major_id = len(columns["major_id"])
+        columns["major_id"].append(major_id)
+        columns["university_id"].append(self._university_id)
+        columns["name"].append(major.name)
+        columns["selectivity"].append(major.selectivity)
+        columns["minimum_grade"].append(major.minimum_grade)
+        columns["courses"].append(major.courses)
+        columns["report_month"].append(self._month)
+
+        text = "\n".join(value for _, value in major.fields if value)
+        for code in course_codes(text):
+            self.courses["code"].append(code)
+            self.courses["major_id"].append(major_id)
+            self.courses["university_id"].append(self._university_id)
+            self.courses["report_month"].append(self._month)
+
+    def arrow_tables(self):
+        """{table name: pyarrow.Table}, with the DICTIONARY_COLUMNS dictionary-encoded."""
+        normalized = self.normalized
+        universities = pa.table(self.universities, schema=pa.schema([
+            ("university_id", pa.int32()), ("name", pa.string()), ("domain", pa.string()),
+            ("report_date", pa.timestamp("s")), ("status", pa.string()), ("report_month", pa.string()),
+        ]))
+        universities = universities.append_column(
+            "min_gpa", pc.if_else(pc.is_nan(pa.array(normalized.min_gpa)), None, pa.array(normalized.min_gpa))
+        )
+        for column in ("fall_deadline", "spring_deadline"):
+            days = [None if day == NAT else day_to_date(day) for day in getattr(normalized, column).tolist()]
+            universities = universities.append_column(column, pa.array(days, pa.date32()))
+        units = pa.array(normalized.max_transfer_units)
+        universities = universities.append_column("max_transfer_units", pc.if_else(pc.is_nan(units), None, units))
+
+        tables = {
+            "universities": universities,
+            "general_info": pa.table(self.general_info, schema=pa.schema([
+                ("university_id", pa.int32()), ("position", pa.int16()), ("key", pa.string()),
+                ("value", pa.string()), ("report_month", pa.string()),
+            ])),
+            "majors": pa.table(self.majors, schema=pa.schema([
+                ("major_id", pa.int32()), ("university_id", pa.int32()), ("name", pa.string()),
+                ("selectivity", pa.string()), ("minimum_grade", pa.string()), ("courses", pa.string()),
+                ("report_month", pa.string()),
+            ])),
+            "courses": pa.table(self.courses, schema=pa.schema([
+                ("code", pa.string()), ("major_id", pa.int32()), ("university_id", pa.int32()),
+                ("report_month", pa.string()),
+            ])),
+        }
+        for name, columns in DICTIONARY_COLUMNS.items():
+            table = tables[name]
+            for column in columns:
+                index = table.schema.get_field_index(column)
+                table = table.set_column(index, column, pc.dictionary_encode(table.column(column)))
+            tables[name] = table
+        return tables
+
+def write_dataset(table, directory, file_format):
+    """Write `table` under `directory` partitioned by report_month, replacing what was there."""
+    partitioning = ds.partitioning(pa.schema([table.schema.field("report_month")]), flavor="hive")
+    options = None
+    if file_format == "parquet":
+        options = ds.ParquetFileFormat().make_write_options(compression="zstd")
+    ds.write_dataset(
+        table, directory, format="ipc" if file_format == "arrow" else "parquet",
+        partitioning=partitioning, file_options=options,
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}." + ("arrow" if file_format == "arrow" else "parquet"),
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the reports as partitioned Parquet or Arrow IPC tables.")
+    parser.add_argument("paths", nargs="*", help="Report files or directories of them")
+    parser.add_argument("--db", help=f"Read the reports from a storage.py database (e.g. {DEFAULT_DB_FILENAME})")
+    parser.add_argument("--out", default="analytics", help="Output directory (default: analytics)")
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet",
+                        help="Parquet (zstd) or Arrow IPC files (default: parquet)")
+    args = parser.parse_args()
+    if not args.paths and not args.db:
+        parser.error("give report paths and/or --db")
+    if pa is None:
+        print("FATAL: pyarrow is not installed. Install it with: pip install pyarrow")
+        exit()
+
+    start = time.perf_counter()
+    tables = ColumnarTables()
+    for path in report_files(args.paths):
+        tables.add_report(read_report_records(path))
+    if args.db:
+        store = ReportStore(args.db)
+        for report in store.reports():
+            tables.add_report(report_records(report))
+        store.close()
+
+    for name, table in tables.arrow_tables().items():
+        directory = os.path.join(args.out, name)
+        write_dataset(table, directory, args.format)
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files)
+        print(f"  {name:<13} {table.num_rows:>8} rows  {size / 1024:>8.0f} KiB")
+    print(f"✅ Exported to {args.out}/ ({args.format}) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,100 @@
+import re
+
+# -----------------------------------------------------------------------------
+# Truncated Reports and Continuations
+# -----------------------------------------------------------------------------
+#
+# Reports come back in one of two delimiter styles. Either every block is
+# closed by repeating its tag:
+#
+#   --- GENERAL_INFO_START ---
+#   ...
+#   --- GENERAL_INFO_START ---
+#   --- MAJOR_START ---
+#   ...
+#   --- MAJOR_START ---
+#
+# or each tag only opens a block that runs until the next one. A response
+# that stops at the output limit is cut back to its last complete block and
+# the model is asked to carry on from there.
+
+GENERAL_INFO_DELIMITER = "--- GENERAL_INFO_START ---"
+MAJOR_DELIMITER = "--- MAJOR_START ---"
+
+MAJOR_NAME_LINE = re.compile(r"^\s*\**Major Name\**\s*:\s*(.+?)\s*$", re.MULTILINE)
+
+def uses_closing_tags(text):
+    return text.count(GENERAL_INFO_DELIMITER) >= 2
+
+def is_truncated(text, finish_reason):
+    """
+    True if the response stopped at the output limit or, for the closing
+    tag style, left a MAJOR_START block open.
+    """
+    return counts_truncated(text.count(GENERAL_INFO_DELIMITER), text.count(MAJOR_DELIMITER), finish_reason)
+
+def counts_truncated(general_info_count, major_count, finish_reason):
+    """is_truncated, from the number of each delimiter in the text."""
+    if finish_reason == "MAX_TOKENS":
+        return True
+    return general_info_count >= 2 and major_count % 2 == 1
+
+class DelimiterCounter:
+    """
+    Counts the delimiters of a report as it streams in, so a streamed
+    report can be checked with is_truncated without reading it back.
+    A delimiter split across two chunks is counted once.
+    """
+
+    def __init__(self):
+        self.counts = {GENERAL_INFO_DELIMITER: 0, MAJOR_DELIMITER: 0}
+        self._tail = ""
+        self._keep = max(len(delimiter) for delimiter in self.counts) - 1
+
+    def feed(self, text):
+        buffer = self._tail + text
+        for delimiter in self.counts:
+            # Occurrences that end inside the tail were counted with the previous chunk
+            self.counts[delimiter] += buffer.count(delimiter, max(0, len(self._tail) - len(delimiter) + 1))
+        self._tail = buffer[-self._keep:]
+
+    def truncated(self, finish_reason):
+        return counts_truncated(self.counts[GENERAL_INFO_DELIMITER], self.counts[MAJOR_DELIMITER], finish_reason)
+
+def complete_prefix(text):
+    """
+    The part of `text` made of complete blocks: up to the last closing tag
+    in the closing tag style, otherwise up to the start of the last major
+    (which may have been cut short). Empty if not even the general block
+    is known to be complete.
+    """
+    positions = [m.start() for m in re.finditer(re.escape(MAJOR_DELIMITER), text)]
+    if uses_closing_tags(text):
+        if len(positions) % 2 == 1:
+            return text[:positions[-1]].rstrip()
+        if positions:
+            return text[:positions[-1] + len(MAJOR_DELIMITER)]
+        return text[:text.rindex(GENERAL_INFO_DELIMITER) + len(GENERAL_INFO_DELIMITER)]
+    if not positions:
+        return ""
+    return text[:positions[-1]].rstrip()
+
+def continuation_prompt(prefix):
+    """Instructions for the turn that asks the model to resume after `prefix`."""
+    written = MAJOR_NAME_LINE.findall(prefix)
+    prompt = (
+        "Your previous response was cut off by the output limit and has been trimmed to its last "
+        "complete block. Continue the report from the next block in exactly the same delimited "
+        "format. Do NOT repeat the general information or any block already written, and do NOT "
+        "include any introductory text."
+    )
+    if written:
+        prompt += " Majors already written: " + "; ".join(written) + "."
+    return prompt
+
+def stitch(prefix, continuation):
+    """Append a continuation to a complete prefix, dropping any preamble before its first block."""
+    start = continuation.find(MAJOR_DELIMITER)
+    if start == -1:
+        return prefix
+    return prefix.rstrip() + "\n\n" + continuation[start:].strip()
@@ -0,0 +1,224 @@
+import argparse
+import json
+import time
+from array import array
+from collections import defaultdict
+
+from report_parser import Major, University, course_codes
+from storage import DEFAULT_DB_FILENAME, ReportStore, read_report_records, report_records
+from search_index import report_files
+
+# -----------------------------------------------------------------------------
+# Cross-University Course Graph
+# -----------------------------------------------------------------------------
+#
+# A bipartite graph of majors and the courses they require, with every
+# course code, university and major replaced by an integer id and the
+# edges kept in CSR form (compressed sparse rows) in array.array columns:
+#
+#   major_offsets[m] .. major_offsets[m + 1]   slice of major_courses: course ids of major m
+#   course_offsets[c] .. course_offsets[c + 1] slice of course_majors: major ids requiring course c
+#   major_university[m]                        university id of major m
+#
+# Both sides are sorted, so "which majors require all of these courses"
+# intersects a few short sorted slices, and majors with the same course
+# set are found by comparing rows. Required courses are the codes in a
+# major's "Required Lower-Division Courses" field (the whole block if it
+# has none), found with report_parser.course_codes.
+#
+#   python course_graph.py build colleges/
+#   python course_graph.py requires "MTH 1321" "CHE 1301"
+#   python course_graph.py shared --min-universities 3
+
+DEFAULT_GRAPH_FILENAME = "course_graph.bin"
+MAGIC = b"COURSEGRAPH1\n"
+ARRAYS = ("major_offsets", "major_courses", "course_offsets", "course_majors", "major_university")
+
+class CourseGraph:
+    def __init__(self, courses, universities, majors, **arrays):
+        self.courses = courses             # course id -> code
+        self.universities = universities   # university id -> name
+        self.majors = majors               # major id -> major name
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self._course_ids = {code: i for i, code in enumerate(courses)}
+
+    @classmethod
+    def build(cls, record_streams):
+        """Build the graph from an iterable of record iterators (see report_parser)."""
+        universities, majors, major_university, rows = [], [], [], []
+        for records in record_streams:
+            university_id = None
+            for record in records:
+                if isinstance(record, University):
+                    university_id = None if record.failed else len(universities)
+                    if university_id is not None:
+                        universities.append(record.name)
+                elif isinstance(record, Major) and university_id is not None:
+                    text = record.courses or "\n".join(value for _, value in record.fields if value)
+                    majors.append(record.name)
+                    major_university.append(university_id)
+                    rows.append(course_codes(text))
+
+        courses = sorted({code for row in rows for code in row})
+        course_ids = {code: i for i, code in enumerate(courses)}
+
+        major_offsets = array('I', [0])
+        major_courses = array('I')
+        for row in rows:
+            major_courses.extend(sorted(course_ids[code] for code in row))
+            major_offsets.append(len(major_courses))
+
+        # Transpose with a counting sort; majors are visited in order, so each row stays sorted
+        counts = array('I', bytes(4 * (len(courses) + 1)))
+        for course_id in major_courses:
+            counts[course_id + 1] += 1
+        course_offsets = array('I', counts)
+        for i in range(1, len(course_offsets)):
+            course_offsets[i] += course_offsets[i - 1]
+        fill = array('I', course_offsets[:-1])
+        course_majors = array('I', bytes(4 * len(major_courses)))
+        for major_id in range(len(rows)):
+            for course_id in major_courses[major_offsets[major_id]:major_offsets[major_id + 1]]:
+                course_majors[fill[course_id]] = major_id
+                fill[course_id] += 1
+
+        return cls(courses, universities, majors, major_offsets=major_offsets, major_courses=major_courses,
+                   course_offsets=course_offsets, course_majors=course_majors,
+                   major_university=array('I', major_university))
+
+    # -- Storage ----------------------------------------------------------------
+
+    def save(self, path):
+        """Write the graph as a JSON header line followed by the raw arrays."""
+        header = {
+            "courses": self.courses, "universities": self.universities, "majors": self.majors,
+            "arrays": [(name, len(getattr(self, name))) for name in ARRAYS],
+        }
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+            for name in ARRAYS:
+                getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.readline() != MAGIC:
+                raise ValueError(f"{path} is not a course graph file")
+            header = json.loads(f.readline())
+            arrays = {}
+            for name, length in header["arrays"]:
+                arrays[name] = array('I')
+                arrays[name].fromfile(f, length)
+        return cls(header["courses"], header["universities"], header["majors"], **arrays)
+
+    # -- Queries ----------------------------------------------------------------
+
+    def courses_of(self, major_id):
+        return self.major_courses[self.major_offsets[major_id]:self.major_offsets[major_id + 1]]
+
+    def majors_requiring(self, codes):
+        """Ids of the majors whose required courses include every code in `codes`."""
+        course_ids = []
+        for code in codes:
+            normalized = course_codes(code.upper())
+            course_id = self._course_ids.get(normalized[0] if normalized else code)
+            if course_id is None:
+                return []
+            course_ids.append(course_id)
+        if not course_ids:
+            return []
+        slices = sorted(
+            (self.course_majors[self.course_offsets[c]:self.course_offsets[c + 1]] for c in course_ids), key=len
+        )
+        matches = set(slices[0])
+        for other in slices[1:]:
+            matches.intersection_update(other)
+        return sorted(matches)
+
+    def universities_requiring(self, codes):
+        """{university name: [major names]} for majors requiring every code in `codes`."""
+        result = defaultdict(list)
+        for major_id in self.majors_requiring(codes):
+            result[self.universities[self.major_university[major_id]]].append(self.majors[major_id])
+        return dict(result)
+
+    def shared_course_sets(self, min_universities=2):
+        """
+        Course sets required, as a whole, by majors at `min_universities` or
+        more universities: [(codes, {university: [majors]})], most widely
+        shared first. Majors without any course codes are ignored.
+        """
+        groups = defaultdict(list)
+        for major_id in range(len(self.majors)):
+            row = self.courses_of(major_id)
+            if len(row):
+                groups[row.tobytes()].append(major_id)
+        shared = []
+        for key, major_ids in groups.items():
+            by_university = defaultdict(list)
+            for major_id in major_ids:
+                by_university[self.universities[self.major_university[major_id]]].append(self.majors[major_id])
+            if len(by_university) >= min_universities:
+                row = array('I')
+                row.frombytes(key)
+                shared.append(([self.courses[c] for c in row], dict(by_university)))
+        shared.sort(key=lambda item: (-len(item[1]), -len(item[0])))
+        return shared
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the major/course/university graph.")
+    parser.add_argument("--graph", default=DEFAULT_GRAPH_FILENAME,
+                        help=f"Graph file (default: {DEFAULT_GRAPH_FILENAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the graph from report files and/or a report database")
+    build.add_argument("paths", nargs="*", help="Report files or directories of them")
+    build.add_argument("--db", help=f"Also read the reports in a storage.py database (e.g. {DEFAULT_DB_FILENAME})")
+    requires = commands.add_parser("requires", help="List the majors that require all of the given courses")
+    requires.add_argument("codes", nargs="+", help='Course codes, e.g. "MTH 1321"')
+    shared = commands.add_parser("shared", help="List course sets required by majors at several universities")
+    shared.add_argument("--min-universities", type=int, default=2)
+    shared.add_argument("--limit", type=int, default=20, help="Most course sets to show (default: 20)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "build":
+        if not args.paths and not args.db:
+            parser.error("give report paths and/or --db")
+        streams = [read_report_records(path) for path in report_files(args.paths)]
+        if args.db:
+            store = ReportStore(args.db)
+            streams.extend(report_records(report) for report in store.reports())
+            store.close()
+        graph = CourseGraph.build(streams)
+        graph.save(args.graph)
+        print(f"✅ {len(graph.universities)} universities, {len(graph.majors)} majors, "
+              f"{len(graph.courses)} courses, {len(graph.major_courses)} requirements "
+              f"saved to {args.graph} in {time.perf_counter() - start:.1f}s")
+        exit()
+
+    try:
+        graph = CourseGraph.load(args.graph)
+    except (OSError, ValueError) as e:
+        print(f"FATAL: Could not load {args.graph} ({e}); run 'course_graph.py build' first.")
+        exit()
+    loaded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if args.command == "requires":
+        result = graph.universities_requiring(args.codes)
+        elapsed = time.perf_counter() - start
+        for university, majors in sorted(result.items()):
+            print(f"{university}: {', '.join(majors)}")
+        print(f"{len(result)} universities require {' + '.join(args.codes)} "
+              f"(loaded in {loaded * 1000:.0f} ms, answered in {elapsed * 1000:.2f} ms)")
+    else:
+        sets = graph.shared_course_sets(args.min_universities)
+        elapsed = time.perf_counter() - start
+        for codes, by_university in sets[:args.limit]:
+            print(f"{len(by_university):>4} universities: {', '.join(codes)}")
+            for university, majors in sorted(by_university.items())[:5]:
+                print(f"        {university}: {', '.join(majors)}")
+        print(f"{len(sets)} course sets shared by {args.min_universities}+ universities "
+              f"(loaded in {loaded * 1000:.0f} ms, answered in {elapsed * 1000:.2f} ms)")
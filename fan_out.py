@@ -0,0 +1,77 @@
+import re
+
+# -----------------------------------------------------------------------------
+# Fan-Out Extraction
+# -----------------------------------------------------------------------------
+#
+# A fanned-out report is built from one overview call, which returns the
+# general block followed by the names of the transfer majors:
+#
+#   --- GENERAL_INFO_START ---
+#   ...
+#   --- MAJOR_LIST_START ---
+#   Computer Science
+#   Nursing
+#
+# and one call per major, each returning a single MAJOR_START block. The
+# pieces are assembled into the same layout a single exhaustive call yields.
+#
+# A major whose call fails is saved as a stand-in block and the report is
+# marked STATUS: INCOMPLETE - <n> majors failed; the next run fetches just
+# those majors again and swaps their blocks in.
+
+MAJOR_LIST_DELIMITER = "--- MAJOR_LIST_START ---"
+MAJOR_DELIMITER = "--- MAJOR_START ---"
+
+# Bullets or numbering the model may put in front of a major name
+LIST_MARKER = re.compile(r"^(?:[-*•]|\d+[.)])\s*")
+
+FAILED_MAJORS_STATUS = re.compile(r"^INCOMPLETE - \d+ majors? failed$")
+FAILED_MAJOR_BLOCK = re.compile(
+    rf"^{re.escape(MAJOR_DELIMITER)}\nMajor Name: (?P<major>.+)\nSTATUS: FAILED - .*$", re.MULTILINE
+)
+
+def split_overview(text):
+    """
+    Split an overview response into (general_info, majors): the text before
+    MAJOR_LIST_DELIMITER and the major names listed after it, in order and
+    without duplicates. Without a major list, all text is general info.
+    """
+    general_info, _, listing = text.partition(MAJOR_LIST_DELIMITER)
+    majors = []
+    seen = set()
+    for line in listing.splitlines():
+        name = LIST_MARKER.sub("", line.strip()).strip()
+        # Skip blank lines and a closing delimiter if the model pairs its tags
+        if not name or name.startswith("---") or name.casefold() in seen:
+            continue
+        seen.add(name.casefold())
+        majors.append(name)
+    return general_info.strip(), majors
+
+def major_block(text):
+    """A per-major response as a block that starts with MAJOR_DELIMITER."""
+    text = text.strip()
+    start = text.find(MAJOR_DELIMITER)
+    if start == -1:
+        return f"{MAJOR_DELIMITER}\n{text}"
+    return text[start:]
+
+def failed_major_block(major, error):
+    """Stand-in block for a major whose call failed, so the rest of the report survives."""
+    return f"{MAJOR_DELIMITER}\nMajor Name: {major}\nSTATUS: FAILED - {' '.join(str(error).split())}"
+
+def failed_majors_status(count):
+    """STATUS value of a report with `count` failed major blocks."""
+    return f"INCOMPLETE - {count} major{'s' if count != 1 else ''} failed"
+
+def failed_majors(body):
+    """Names of the majors whose blocks in a fanned-out report are failed_major_block stand-ins."""
+    return [match.group("major") for match in FAILED_MAJOR_BLOCK.finditer(body)]
+
+def replace_failed_majors(body, blocks):
+    """Swap the stand-in blocks in `body` for the new ones in `blocks` ({major: block})."""
+    return FAILED_MAJOR_BLOCK.sub(lambda match: blocks.get(match.group("major"), match.group(0)), body)
+
+def assemble_report(general_info, major_blocks):
+    return "\n\n".join([general_info] + major_blocks)
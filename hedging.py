@@ -0,0 +1,122 @@
+import queue
+import socket
+import threading
+
+# -----------------------------------------------------------------------------
+# Hedged Requests
+# -----------------------------------------------------------------------------
+#
+# A hedged call sends a request and, if nothing has come back within the
+# hedge delay, sends a duplicate. Whichever completes first wins; the other is
+# cancelled by shutting down its socket, which unblocks the waiting read. An
+# attempt cancelled before it has a socket (e.g. while waiting for the rate
+# limiter) is flagged instead, and never sends its request.
+
+_current = threading.local()
+
+class HedgeCancelled(Exception):
+    """Raised in a hedged attempt that was cancelled before its request went out."""
+
+class _Attempt:
+    def __init__(self):
+        self.connection = None
+        self.done = False
+        self.cancelled = False
+
+    def cancel(self):
+        if self.done:
+            return
+        self.cancelled = True
+        sock = getattr(self.connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+def attempt_cancelled():
+    """True if this thread is running a hedged attempt that has been cancelled."""
+    attempt = getattr(_current, "attempt", None)
+    return attempt is not None and attempt.cancelled
+
+def track_connection(connection):
+    """
+    Connection hook (see latency.TimedHTTPAdapter): remembers which pooled
+    connection the current hedged attempt is using so it can be cancelled,
+    and stops an attempt that was cancelled before it got this far.
+    """
+    attempt = getattr(_current, "attempt", None)
+    if attempt is not None:
+        attempt.connection = connection
+        if attempt.cancelled:
+            raise HedgeCancelled("hedged request cancelled before it was sent")
+
+class HedgeBudget:
+    """Caps hedges at `max_percent` percent of primary requests."""
+
+    def __init__(self, max_percent):
+        self.max_percent = max_percent
+        self.primaries = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_primary(self):
+        with self._lock:
+            self.primaries += 1
+
+    def try_hedge(self):
+        with self._lock:
+            if (self.hedges + 1) * 100 > self.max_percent * self.primaries:
+                return False
+            self.hedges += 1
+            return True
+
+def hedged_call(send, hedge_after, budget, label):
+    """
+    Run `send()` and, if it has not finished after `hedge_after` seconds and
+    the budget allows, race a duplicate against it. Returns the first
+    successful result; if every attempt fails, the last error is raised.
+    """
+    results = queue.Queue()
+    attempts = []
+
+    def start():
+        attempt = _Attempt()
+        attempts.append(attempt)
+
+        def run():
+            _current.attempt = attempt
+            try:
+                result = send()
+                attempt.done = True
+                results.put((attempt, result, None))
+            except Exception as e:
+                attempt.done = True
+                results.put((attempt, None, e))
+            finally:
+                _current.attempt = None
+
+        threading.Thread(target=run, daemon=True).start()
+
+    budget.record_primary()
+    start()
+    try:
+        finished, result, error = results.get(timeout=hedge_after)
+    except queue.Empty:
+        if budget.try_hedge():
+            print(f"No response for {label} after {hedge_after:.1f}s; sending a hedged request...")
+            start()
+        finished, result, error = results.get()
+
+    # If the first attempt to finish failed, wait for the one still running
+    pending = len(attempts) - 1
+    while error is not None and pending:
+        finished, result, error = results.get()
+        pending -= 1
+
+    for attempt in attempts:
+        if attempt is not finished:
+            attempt.cancel()
+    if error is not None:
+        raise error
+    return result
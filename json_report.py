@@ -0,0 +1,77 @@
+import json
+
+# -----------------------------------------------------------------------------
+# Structured JSON Reports
+# -----------------------------------------------------------------------------
+#
+# With --json the model fills in REPORT_SCHEMA instead of writing delimited
+# text, and each report is stored as one compact JSON object:
+#
+#   {"name": "Baylor University", "domain": "www.baylor.edu",
+#    "report_date": "2025-11-08 14:28:06",
+#    "general_info": {"minimum_gpa": "...", ...},
+#    "majors": [{"name": "...", "courses": ["..."], "minimum_grade": "...", ...}]}
+#
+# Failure records carry a "status" of "FAILED - <error>" and no report data.
+
+GENERAL_INFO_FIELDS = (
+    "minimum_gpa",
+    "application_deadlines",
+    "required_tests",
+    "transfer_pathways",
+    "application_components",
+    "ge_certification",
+    "max_transferable_units",
+    "residency_requirements",
+)
+
+# responseSchema for generateContent (an OpenAPI subset)
+REPORT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "general_info": {
+            "type": "OBJECT",
+            "properties": {field: {"type": "STRING"} for field in GENERAL_INFO_FIELDS},
+        },
+        "majors": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "name": {"type": "STRING"},
+                    "courses": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "minimum_grade": {"type": "STRING"},
+                    "selectivity": {"type": "STRING"},
+                    "notes": {"type": "STRING"},
+                },
+                "required": ["name", "courses"],
+            },
+        },
+    },
+    "required": ["general_info", "majors"],
+}
+
+GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": REPORT_SCHEMA,
+}
+
+def dump_record(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def json_report(university_name, domain, current_time, response_text, finish_reason=None):
+    """
+    Compact JSON record for a structured response. Raises ValueError if the
+    model's output is not a JSON object (e.g. it was cut off mid-way).
+    """
+    try:
+        report = json.loads(response_text)
+    except ValueError:
+        raise ValueError(f"Response is not valid JSON (finishReason {finish_reason})") from None
+    if not isinstance(report, dict):
+        raise ValueError("Response is not a JSON object")
+    return dump_record({"name": university_name, "domain": domain, "report_date": current_time, **report})
+
+def json_failure_record(university_name, domain, current_time, error):
+    return dump_record({"name": university_name, "domain": domain, "report_date": current_time,
+                        "status": f"FAILED - {error}"})
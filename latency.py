@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# -----------------------------------------------------------------------------
+# Latency Tracking and Adaptive Timeouts
+# -----------------------------------------------------------------------------
+
+# Per kind of measurement: (cold-start timeout, lower bound, upper bound,
+# multiplier applied to the high percentile). "connect" is TCP+TLS setup,
+# "ttfb" the wait for a buffered response, "stream_ttfb" the wait for the
+# first event of a streamed one.
+TIMEOUT_SETTINGS = {
+    "connect": (10.0, 1.0, 10.0, 3.0),
+    "ttfb": (120.0, 30.0, 600.0, 1.5),
+    "stream_ttfb": (30.0, 10.0, 300.0, 2.0),
+}
+
+class LatencyTracker:
+    """
+    Rolling latency histogram that turns observed connect and time-to-first-
+    byte samples into timeouts.
+
+    Each kind keeps its last `window` samples; its timeout is the
+    `percentile` sample times a safety multiplier, clamped to sane bounds.
+    Slow universities also get a per-key floor from their own last
+    observation, so a large report is not cut off by the global figure.
+    Until `min_samples` have been seen the cold-start defaults apply.
+    """
+
+    def __init__(self, window=500, percentile=0.99, min_samples=20):
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples = {kind: deque(maxlen=window) for kind in TIMEOUT_SETTINGS}
+        self._per_key = {kind: {} for kind in TIMEOUT_SETTINGS}
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds, key=None):
+        with self._lock:
+            self._samples[kind].append(seconds)
+            if key is not None:
+                self._per_key[kind][key] = seconds
+
+    def sample_count(self, kind):
+        with self._lock:
+            return len(self._samples[kind])
+
+    def quantile(self, kind, q):
+        """The q-quantile of the recorded samples, or None if there are none."""
+        with self._lock:
+            ordered = sorted(self._samples[kind])
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self, kind, key=None):
+        """Timeout in seconds for the next request of this kind."""
+        default, lower, upper, multiplier = TIMEOUT_SETTINGS[kind]
+        with self._lock:
+            enough = len(self._samples[kind]) >= self.min_samples
+            key_seconds = self._per_key[kind].get(key)
+
+        value = self.quantile(kind, self.percentile) * multiplier if enough else default
+        if key_seconds is not None:
+            value = max(value, key_seconds * multiplier)
+        return min(upper, max(lower, value))
+
+    def load(self, filepath):
+        """Restore samples saved by a previous run; a missing file is not an error."""
+        if not os.path.exists(filepath):
+            return
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Warning: Ignoring unreadable latency stats {filepath}: {e}")
+            return
+        with self._lock:
+            for kind in TIMEOUT_SETTINGS:
+                self._samples[kind].extend(data.get("samples", {}).get(kind, []))
+                self._per_key[kind].update(data.get("per_key", {}).get(kind, {}))
+
+    def save(self, filepath):
+        with self._lock:
+            data = {
+                "saved_at": time.time(),
+                "samples": {kind: list(samples) for kind, samples in self._samples.items()},
+                "per_key": self._per_key,
+            }
+            tmp_path = filepath + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        os.replace(tmp_path, filepath)
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose new connections report how long TCP+TLS setup took
+    to `on_connect(seconds)`. Reused keep-alive connections report nothing.
+    If given, `on_request(connection)` is called with the connection each
+    request is about to be sent on.
+    """
+
+    def __init__(self, on_connect, on_request=None, **kwargs):
+        self.on_connect = on_connect
+        self.on_request = on_request
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_connect = self.on_connect
+        on_request = self.on_request
+
+        class TimedHTTPConnection(HTTPConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                on_connect(time.perf_counter() - start)
+
+            def request(self, *args, **kwargs):
+                if on_request:
+                    on_request(self)
+                return super().request(*args, **kwargs)
+
+        class TimedHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                start = time.perf_counter()
+                super().connect()
+                on_connect(time.perf_counter() - start)
+
+            def request(self, *args, **kwargs):
+                if on_request:
+                    on_request(self)
+                return super().request(*args, **kwargs)
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = TimedHTTPConnection
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = TimedHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
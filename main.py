@@ -1,37 +1,202 @@
+import asyncio
+import atexit
 import requests
 import json
 import time
 import os
+import re
 import argparse
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from rate_limiter import RateLimiter, DailyQuotaExceeded
+from batch import BatchClient, BatchError, write_batch_requests
+from checkpoint import (group_failures, has_failed_majors, is_failed, parse_report_header, pending_universities,
+                        read_report_header, read_report_headers, report_age)
+from retry_policy import RetryPolicy, classify_error
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from latency import LatencyTracker, TimedHTTPAdapter
+from hedging import HedgeBudget, HedgeCancelled, attempt_cancelled, hedged_call, track_connection
+from response_cache import ResponseCache
+from packing import CHARS_PER_TOKEN, UNIVERSITY_DELIMITER, PackSizer, split_packed_report
+from continuation import DelimiterCounter, complete_prefix, continuation_prompt, is_truncated, stitch
+from json_report import GENERATION_CONFIG, json_failure_record, json_report
+from fan_out import (MAJOR_DELIMITER, MAJOR_LIST_DELIMITER, assemble_report,
+                     failed_major_block, failed_majors, failed_majors_status, major_block,
+                     replace_failed_majors, split_overview)
+from storage import DEFAULT_DB_FILENAME, ReportStore, sanitize_filename
+from segment_log import DEFAULT_LOG_DIR, SegmentLog
+from search_index import DEFAULT_INDEX_FILENAME, SearchIndex
+from metrics import MetricsCollector
+
 # -----------------------------------------------------------------------------
 # Configuration & Constants
 # -----------------------------------------------------------------------------
 
 # IMPORTANT: If running this outside a platform like Canvas, replace the empty 
-# string with your actual Gemini API key.
-API_KEY = "" 
+# string with your actual Gemini API key (or set GEMINI_API_KEY).
+API_KEY = os.environ.get("GEMINI_API_KEY", "")
+
+# The model and endpoint to use for grounded generation. Point API_BASE at
+# stub_server.py (--api-base) to run without the real service.
+DEFAULT_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+API_BASE = DEFAULT_API_BASE
+MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
+
+def gemini_url(method):
+    """Build the endpoint URL for a model method such as 'generateContent'."""
+    return f"{API_BASE}/models/{MODEL_NAME}:{method}?key={API_KEY}"
 
-# The model and endpoint to use for grounded generation
-API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-09-2025:generateContent?key={API_KEY}"
+def endpoint_state_path(filename):
+    """
+    Where state about the endpoint itself is kept: `filename` for the real
+    API, and a file named after API_BASE for any other (such as a stub),
+    so one endpoint's history never stands in for another's.
+    """
+    if API_BASE == DEFAULT_API_BASE:
+        return filename
+    root, extension = os.path.splitext(filename)
+    endpoint = re.sub(r"[^A-Za-z0-9.-]+", "_", API_BASE.split("//", 1)[-1]).strip("_")
+    return f"{root}.{endpoint}{extension}"
 
 # File paths
 UNIVERSITY_JSON_FILENAME = "tester.json" # File to load data from
 COLLEGES_DIR = "colleges"  # Directory to store individual college files
-POLITENESS_DELAY_SECONDS = 3 # Required delay between API calls
+REPORTS_DB_FILENAME = DEFAULT_DB_FILENAME # SQLite database every report is stored in
+SEGMENT_LOG_DIR = DEFAULT_LOG_DIR # Append-only segment log for --sink log
+REPORT_SINKS = ("sqlite", "text", "log")
+SEARCH_INDEX_FILENAME = DEFAULT_INDEX_FILENAME # Full-text index kept current by --search-index
+BATCH_REQUESTS_FILENAME = "requests.jsonl" # Batch API input written by --batch
+BATCH_POLL_INTERVAL_SECONDS = 30
+# Successful reports younger than this are not regenerated, and fanned-out
+# ones with failed majors are finished rather than started over
+MAX_REPORT_AGE_HOURS = 24 * 7
+
+# --retry-failed: minimum seconds since the latest failure of each class
+# before it is retried, and the concurrency cap for its pass (None keeps
+# --concurrency). Timeouts are retried in streaming mode, where the read
+# timeout only bounds the gap between chunks, and fanned-out reports with
+# failed majors in fan-out mode, which re-fetches just those majors.
+FAILURE_RETRY_PLAN = {
+    "timeout": (0, None),
+    "other": (10, None),
+    "server_error": (30, None),
+    "rate_limited": (60, 1),
+    "failed_majors": (10, None),
+}
+
+# Connect and first-byte timeouts are derived from observed latency (see
+# latency.py); the samples persist here, per endpoint, so each run starts
+# calibrated
+LATENCY_STATS_FILENAME = "latency_stats.json"
+# Requests sent in the last 24h, so the RPD quota holds across reruns (kept
+# per endpoint, see endpoint_state_path)
+RATE_LIMIT_STATE_FILENAME = "rate_limit_state.json"
+METRICS_FILENAME = "metrics.jsonl" # One record per university per run (see metrics.py)
+
+# Successful generateContent responses are cached on disk by payload hash
+RESPONSE_CACHE_DIR = ".response_cache"
+RESPONSE_CACHE_TTL_HOURS = 24
+RESPONSE_CACHE_MAX_MB = 200
+
+# --context-cache: lifetime of the cached instructions; must outlast the run
+CONTEXT_CACHE_TTL_SECONDS = 2 * 60 * 60
+# Smallest context the API will cache for gemini-2.5-flash models; below it
+# cachedContents.create is rejected and every request carries the full prompt
+CONTEXT_CACHE_MIN_TOKENS = 1024
+
+# --pack: universities per request are sized so their combined reports use at
+# most PACK_OUTPUT_HEADROOM of the model's output limit (thinking included)
+MAX_OUTPUT_TOKENS = 65536
+PACK_OUTPUT_HEADROOM = 0.6
+
+# Follow-up requests for a report cut off at the output limit before giving
+# up and saving only its complete blocks
+MAX_CONTINUATIONS = 3
+
+# --fan-out: per-major calls in flight at once for each university
+FAN_OUT_MAJOR_CONCURRENCY = 4
+
+# --hedge: send a duplicate request when no first byte has arrived within this
+# percentile of observed latency, for at most HEDGE_MAX_PERCENT of requests
+HEDGE_PERCENTILE = 0.95
+HEDGE_MAX_PERCENT = 10
+
+# Scheduling
+DEFAULT_CONCURRENCY = 4 # Universities processed at once
+
+# Retries: attempts per request, jitter bounds, and the share of all requests
+# in a run that may be retries
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY_SECONDS = 1
+RETRY_MAX_DELAY_SECONDS = 60
+RETRY_BUDGET_RATIO = 0.2
+
+# Circuit breaker: consecutive transient failures that open it, seconds before
+# a probe request, and how many times it may open before the run stops
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 60
+BREAKER_MAX_TRIPS = 3
+
+# Gemini quotas (free tier for gemini-2.5-flash); override with --rpm/--tpm/--rpd
+GEMINI_REQUESTS_PER_MINUTE = 10
+GEMINI_TOKENS_PER_MINUTE = 250000
+GEMINI_REQUESTS_PER_DAY = 250
+
+def create_http_session(pool_size):
+    """
+    Create a keep-alive session whose connection pool can hold one connection
+    per concurrent worker, so TCP+TLS handshakes happen once per connection
+    rather than once per request. New connections report their setup time
+    to LATENCY_TRACKER.
+    """
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(
+        on_connect=record_connect,
+        on_request=track_connection,
+        pool_connections=1, pool_maxsize=pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+def record_connect(seconds):
+    LATENCY_TRACKER.record("connect", seconds)
+    METRICS.record_connect(seconds)
+
+def record_retry():
+    METRICS.record_retry()
+
+# Shared by every call to the Gemini endpoint
+LATENCY_TRACKER = LatencyTracker()
+METRICS = MetricsCollector() # Replaced in __main__ by one that also writes --metrics
+RATE_LIMITER = RateLimiter(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE, GEMINI_REQUESTS_PER_DAY)
+HTTP_SESSION = create_http_session(DEFAULT_CONCURRENCY)
+RETRY_POLICY = RetryPolicy(MAX_ATTEMPTS, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS, RETRY_BUDGET_RATIO,
+                           on_retry=record_retry)
+
+def create_circuit_breaker(failure_threshold, reset_timeout):
+    """Breaker that only counts errors worth retrying (timeouts, 429, 5xx) as failures."""
+    return CircuitBreaker(failure_threshold, reset_timeout,
+                          is_failure=lambda error: classify_error(error) is not None)
+
+CIRCUIT_BREAKER = create_circuit_breaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+HEDGE_BUDGET = None # Set by --hedge
+RESPONSE_CACHE = None # Set in __main__ unless --no-cache
+FORCE_REFRESH = False # Set by --force: fetch fresh responses instead of reading RESPONSE_CACHE
+CONTEXT_CACHE_NAME = None # cachedContents resource holding the shared instructions (--context-cache)
+JSON_OUTPUT = False # Set by --json: structured responses stored as .json reports
+REPORT_STORE = None # ReportStore for --sink sqlite
+SEGMENT_LOG = None # SegmentLog for --sink log
+WRITE_TEXT_FILES = True # Set by --sink text: write one file per report to COLLEGES_DIR
+SEARCH_INDEX = None # SearchIndex for --search-index
 
 # Ensure the colleges directory exists
 os.makedirs(COLLEGES_DIR, exist_ok=True)
 
-def sanitize_filename(filename):
-    """Convert a string into a safe filename."""
-    # Replace invalid filename characters with underscores
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
-    return filename.strip()
-
 # -----------------------------------------------------------------------------
 # Data Loading and LLM Generation Functions
 # -----------------------------------------------------------------------------
@@ -48,41 +213,242 @@ def load_university_data(filepath):
         print(f"FATAL: Error loading or parsing JSON file {filepath}: {e}")
         return None
 
-def generate_transfer_data(university_name, domain):
+def post_to_gemini(payload, key=None, units=1):
     """
-    Constructs a request to the Gemini API to search the web for transfer 
-    requirements and output a minimalist, delimited text string.
+    Sends a generateContent request and returns the decoded JSON response.
+    An identical payload answered within the cache TTL is served from
+    RESPONSE_CACHE without touching the network. With --hedge, a duplicate
+    is raced against requests slower than the running HEDGE_PERCENTILE
+    latency, within HEDGE_BUDGET. `units` is the number of reports the
+    request asks for (see post_once). A cached response carries the time
+    it was generated in a "cachedAt" field (see report_date).
     """
-    
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cache_key = None
+    if RESPONSE_CACHE is not None:
+        # A context cache's name changes every run; key on what it holds instead
+        identity = payload
+        if "cachedContent" in payload:
+            identity = dict(payload, cachedContent=build_system_prompt(SHARED_PROMPT_SUBJECT))
+        cache_key = ResponseCache.key_for(API_BASE, MODEL_NAME, "generateContent", identity)
+        cached = None if FORCE_REFRESH else RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"Using cached response for {key}")
+            METRICS.record_cache_hit()
+            response, created = cached
+            return dict(response, cachedAt=created)
 
-    system_prompt = f"""
-    You are an expert data extraction agent. Your task is to perform a **COMPREHENSIVE and EXHAUSTIVE** grounded web search focused ONLY on finding transfer student admissions requirements and application components for {university_name} ({domain}). Exclude all financial aid and cost information.
+    hedge_ready = (HEDGE_BUDGET is not None and
+                   LATENCY_TRACKER.sample_count("ttfb") >= LATENCY_TRACKER.min_samples)
+    if hedge_ready:
+        hedge_after = LATENCY_TRACKER.quantile("ttfb", HEDGE_PERCENTILE) * units
+        result = hedged_call(METRICS.bind(lambda: post_once(payload, key, units)), hedge_after, HEDGE_BUDGET, key)
+    else:
+        result = post_once(payload, key, units)
 
-    Your goal is to extract **EVERY SINGLE DATA POINT** a prospective transfer student needs to successfully apply, organized into three key areas: General Admissions, Credit Transfer, and Major-Specific requirements.
+    # Only complete answers are worth replaying
+    candidate = result.get('candidates', [{}])[0]
+    if cache_key and candidate.get('finishReason') == "STOP":
+        RESPONSE_CACHE.put(cache_key, result)
+    return result
 
-    You MUST output a single, RAW TEXT string with the following delimiters. Do NOT include any introductory or concluding text, Markdown formatting, or comments.
+def post_once(payload, key=None, units=1):
+    """
+    Sends one generateContent request over the shared HTTP_SESSION. Every
+    request waits for RATE_LIMITER budget first, and the tokens reported in
+    the response's usageMetadata are charged back to it. Timeouts come from
+    LATENCY_TRACKER; `key` (the university) lets slow universities keep a
+    longer first-byte timeout. A request for `units` packed reports gets
+    that many times the timeout and is recorded as per-report latency.
+    Each request is also recorded in METRICS. A hedged attempt cancelled
+    while it waits for RATE_LIMITER raises HedgeCancelled without sending.
+    """
+    reserved = RATE_LIMITER.acquire(cancelled=attempt_cancelled)
+    if reserved is None:
+        METRICS.record_request(None, 0.0, cancelled=True)
+        raise HedgeCancelled(f"hedged request for {key} cancelled before it was sent")
+    actual_tokens = None
+    read_timeout = LATENCY_TRACKER.timeout("ttfb", key) * units
+    start = time.perf_counter()
+    ttfb = usage = None
+    response_bytes = 0
+    try:
+        response = HTTP_SESSION.post(
+            gemini_url("generateContent"),
+            data=json.dumps(payload),
+            timeout=(LATENCY_TRACKER.timeout("connect"), read_timeout)
+        )
+        # elapsed stops once the headers arrive, i.e. at the first byte
+        ttfb = response.elapsed.total_seconds()
+        LATENCY_TRACKER.record("ttfb", ttfb / units, key)
+        response_bytes = len(response.content)
+        response.raise_for_status() 
 
-    1. Output general admissions requirements and application components under the tag: --- GENERAL_INFO_START ---
+        result = response.json()
+        usage = result.get('usageMetadata', {})
+        actual_tokens = usage.get('totalTokenCount')
+        return result
+    except requests.exceptions.ReadTimeout:
+        # A timed-out wait is a lower bound on the real latency; recording it
+        # stretches the next timeout for this university
+        LATENCY_TRACKER.record("ttfb", read_timeout / units, key)
+        raise
+    finally:
+        RATE_LIMITER.record_usage(reserved, actual_tokens)
+        METRICS.record_request(ttfb, time.perf_counter() - start, usage, response_bytes,
+                               cancelled=attempt_cancelled())
+
+def stream_from_gemini(payload, out_file, key=None, delimiters=None):
+    """
+    Sends a streamGenerateContent request and writes each text chunk of the
+    server-sent event stream to `out_file` as it arrives. The read timeout
+    applies between chunks, so a slow but live response is never cut off.
+    Each chunk is also fed to `delimiters` (a DelimiterCounter), if given.
+    Returns the finishReason of the final chunk.
+    """
+    reserved = RATE_LIMITER.acquire()
+    actual_tokens = None
+    finish_reason = None
+    read_timeout = LATENCY_TRACKER.timeout("stream_ttfb", key)
+    start = time.perf_counter()
+    first_event = True
+    ttfb = None
+    usage = {}
+    response_bytes = 0
+    try:
+        with HTTP_SESSION.post(
+            gemini_url("streamGenerateContent") + "&alt=sse",
+            data=json.dumps(payload),
+            timeout=(LATENCY_TRACKER.timeout("connect"), read_timeout),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+
+            for line in response.iter_lines():
+                response_bytes += len(line) + 1
+                # Each event is a single "data: {...}" line holding one chunk
+                if not line.startswith(b"data:"):
+                    continue
+                if first_event:
+                    ttfb = time.perf_counter() - start
+                    LATENCY_TRACKER.record("stream_ttfb", ttfb, key)
+                    first_event = False
+                chunk = json.loads(line[len(b"data:"):])
+
+                candidate = chunk.get('candidates', [{}])[0]
+                for part in candidate.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        out_file.write(part['text'])
+                        if delimiters is not None:
+                            delimiters.feed(part['text'])
+                out_file.flush()
+
+                finish_reason = candidate.get('finishReason', finish_reason)
+                usage = chunk.get('usageMetadata', usage)
+                actual_tokens = usage.get('totalTokenCount', actual_tokens)
+        return finish_reason
+    except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError) as e:
+        # Read timeouts after the headers surface as ConnectionError
+        timed_out = "Read timed out" in str(e) and not isinstance(e, requests.exceptions.ConnectTimeout)
+        if first_event and timed_out:
+            LATENCY_TRACKER.record("stream_ttfb", read_timeout, key)
+        raise
+    finally:
+        RATE_LIMITER.record_usage(reserved, actual_tokens)
+        METRICS.record_request(ttfb, time.perf_counter() - start, usage, response_bytes)
+
+# What to report in the general block and in each major's block
+GENERAL_INFO_INSTRUCTIONS = """\
     - Include **Minimum GPA** (by college/major if specified), **Application Deadlines** (priority/final), and **Required Tests** (e.g., SAT/ACT for exceptions).
     - Detail **Transfer Pathways** accepted (e.g., TAG, Associate Degree for Transfer (ADT), articulation agreements).
     - Detail all **Application Components Required**: List the number of required **Essays/Personal Insight Questions (PIQs)**, whether **Letters of Recommendation (LORs)** are accepted/required, and if a **Portfolio** or **Interview** is part of the process.
-    - Detail **General Education Certification** accepted (e.g., IGETC, CSU Breadth), **Maximum Transferable Units**, and **Residency Requirements** (how many units must be taken at the university).
+    - Detail **General Education Certification** accepted (e.g., IGETC, CSU Breadth), **Maximum Transferable Units**, and **Residency Requirements** (how many units must be taken at the university)."""
 
-    2. **Crucial Priority**: Before detailing prerequisites, you must first **EXHAUSTIVELY list every available major for transfer.** For **EVERY MAJOR** you encounter on the transfer admissions pages, start a new block with the tag: --- MAJOR_START ---
+MAJOR_BLOCK_INSTRUCTIONS = """\
     - If specific lower-division course numbers are not listed directly on the transfer page, you MUST still list the major and report the *highest-level guidance* available (e.g., "Requires completion of all IGETC/GE" or "Highly competitive, refer to ASSIST.org for specific course sequence.").
-    - If specific course prerequisites **ARE** found, inside this block, provide the **Major Name**, a list of **Required Lower-Division Courses** (course names/numbers), **Minimum Grade** requirements for those courses, and any **Major Selectivity** status (e.g., "Impacted," "Highly Competitive," enrollment restrictions).
+    - If specific course prerequisites **ARE** found, inside this block, provide the **Major Name**, a list of **Required Lower-Division Courses** (course names/numbers), **Minimum Grade** requirements for those courses, and any **Major Selectivity** status (e.g., "Impacted," "Highly Competitive," enrollment restrictions)."""
+
+def build_system_prompt(subject):
+    """
+    The extraction instructions, telling the model to search the web for
+    transfer requirements of `subject` and output a minimalist, delimited
+    text string.
+    """
+    return f"""
+    You are an expert data extraction agent. Your task is to perform a **COMPREHENSIVE and EXHAUSTIVE** grounded web search focused ONLY on finding transfer student admissions requirements and application components for {subject}. Exclude all financial aid and cost information.
+
+    Your goal is to extract **EVERY SINGLE DATA POINT** a prospective transfer student needs to successfully apply, organized into three key areas: General Admissions, Credit Transfer, and Major-Specific requirements.
+
+    You MUST output a single, RAW TEXT string with the following delimiters. Do NOT include any introductory or concluding text, Markdown formatting, or comments.
+
+    1. Output general admissions requirements and application components under the tag: --- GENERAL_INFO_START ---
+{GENERAL_INFO_INSTRUCTIONS}
+
+    2. **Crucial Priority**: Before detailing prerequisites, you must first **EXHAUSTIVELY list every available major for transfer.** For **EVERY MAJOR** you encounter on the transfer admissions pages, start a new block with the tag: --- MAJOR_START ---
+{MAJOR_BLOCK_INSTRUCTIONS}
 
     This final output must be machine-readable and concise.
     """
-    
+
+def build_json_system_prompt(subject):
+    """
+    The extraction instructions for JSON_OUTPUT mode: the same data points,
+    returned in the fields of REPORT_SCHEMA instead of delimited text.
+    """
+    return f"""
+    You are an expert data extraction agent. Your task is to report transfer student admissions requirements and application components for {subject}, as published on its official web pages. Exclude all financial aid and cost information.
+
+    Your goal is to extract **EVERY SINGLE DATA POINT** a prospective transfer student needs to successfully apply, organized into three key areas: General Admissions, Credit Transfer, and Major-Specific requirements.
+
+    Fill in the response schema only. Do NOT include any commentary.
+
+    1. In `general_info`, give the general admissions requirements and application components:
+{GENERAL_INFO_INSTRUCTIONS}
+
+    2. In `majors`, **EXHAUSTIVELY list every available major for transfer**, one entry per major:
+{MAJOR_BLOCK_INSTRUCTIONS}
+    - Put each required course in `courses`, the minimum grade in `minimum_grade`, the selectivity status in `selectivity`, and any other guidance in `notes`.
+
+    Keep every value concise.
+    """
+
+# Subject used when one copy of the instructions serves every university
+SHARED_PROMPT_SUBJECT = "the university named in the user's request, using its own web domain"
+
+def build_payload(university_name, domain):
+    """
+    Constructs a request to the Gemini API for one university. With a
+    context cache in place only the per-university query is sent; the
+    instructions and tools come from CONTEXT_CACHE_NAME. With JSON_OUTPUT
+    the response follows REPORT_SCHEMA.
+    """
+    output_format = "JSON format" if JSON_OUTPUT else "raw text, delimited format"
     user_query = f"""
     Find all major-specific and general transfer prerequisites for {university_name} using the search domain {domain}. 
-    Output the data in the requested raw text, delimited format.
+    Output the data in the requested {output_format}.
     """
+    generation_config = {"generationConfig": GENERATION_CONFIG} if JSON_OUTPUT else {}
+
+    if CONTEXT_CACHE_NAME:
+        return {
+            "contents": [{ "parts": [{ "text": user_query }] }],
+            "cachedContent": CONTEXT_CACHE_NAME,
+            **generation_config,
+        }
+
+    if JSON_OUTPUT:
+        # Gemini 2.5 models reject tools combined with a JSON response type
+        return {
+            "contents": [{ "parts": [{ "text": user_query }] }],
+            "systemInstruction": {
+                "parts": [{ "text": build_json_system_prompt(f"{university_name} ({domain})") }]
+            },
+            **generation_config,
+        }
+
+    system_prompt = build_system_prompt(f"{university_name} ({domain})")
 
     # Construct the API Payload
-    payload = {
+    return {
         "contents": [{ "parts": [{ "text": user_query }] }],
         "tools": [{ "google_search": {} }],
         "systemInstruction": {
@@ -90,111 +456,1131 @@ def generate_transfer_data(university_name, domain):
         },
     }
 
-    # Make the API Call with exponential backoff
-    max_retries = 2
-    initial_delay = 1
-    
-    for attempt in range(max_retries):
+def build_packed_payload(pack):
+    """
+    Constructs one request for several universities, given as (name, domain)
+    pairs. Each report must open with the UNIVERSITY_START delimiter and a
+    NAME line so the response can be split back apart.
+    """
+    listing = "\n".join(f"    - {name} (search domain: {domain})" for name, domain in pack)
+    user_query = f"""
+    Find all major-specific and general transfer prerequisites for each of these {len(pack)} universities, searching each one's own domain:
+{listing}
+    Output one complete report per university in the requested raw text, delimited format. Start each report with a line {UNIVERSITY_DELIMITER} followed by a line NAME: <university name exactly as listed above>.
+    """
+
+    if CONTEXT_CACHE_NAME:
+        return {
+            "contents": [{ "parts": [{ "text": user_query }] }],
+            "cachedContent": CONTEXT_CACHE_NAME,
+        }
+
+    system_prompt = build_system_prompt("each university listed in the user's request, using its own web domain")
+
+    return {
+        "contents": [{ "parts": [{ "text": user_query }] }],
+        "tools": [{ "google_search": {} }],
+        "systemInstruction": {
+            "parts": [{ "text": system_prompt }]
+        },
+    }
+
+def build_overview_payload(university_name, domain):
+    """
+    First call of a fanned-out report: the general block and the names of
+    the transfer majors, without any per-major detail.
+    """
+    system_prompt = f"""
+    You are an expert data extraction agent. Your task is to perform a grounded web search focused ONLY on finding transfer student admissions requirements and application components for {university_name} ({domain}). Exclude all financial aid and cost information.
+
+    You MUST output a single, RAW TEXT string with the following delimiters. Do NOT include any introductory or concluding text, Markdown formatting, or comments.
+
+    1. Output general admissions requirements and application components under the tag: --- GENERAL_INFO_START ---
+{GENERAL_INFO_INSTRUCTIONS}
+
+    2. Then **EXHAUSTIVELY list every available major for transfer** under the tag: {MAJOR_LIST_DELIMITER}
+    - Give one major name per line and nothing else; each major's requirements are gathered separately.
+
+    This final output must be machine-readable and concise.
+    """
+
+    user_query = f"""
+    Find the general transfer requirements and the list of transfer majors for {university_name} using the search domain {domain}. 
+    Output the data in the requested raw text, delimited format.
+    """
+
+    return {
+        "contents": [{ "parts": [{ "text": user_query }] }],
+        "tools": [{ "google_search": {} }],
+        "systemInstruction": {
+            "parts": [{ "text": system_prompt }]
+        },
+    }
+
+def build_major_payload(university_name, domain, major):
+    """Follow-up call of a fanned-out report: the block for a single major."""
+    system_prompt = f"""
+    You are an expert data extraction agent. Your task is to perform a focused grounded web search for the transfer requirements of ONE major at {university_name} ({domain}). Exclude all financial aid and cost information.
+
+    You MUST output a single, RAW TEXT block starting with the tag: {MAJOR_DELIMITER}
+    Do NOT include any introductory or concluding text, Markdown formatting, or comments.
+{MAJOR_BLOCK_INSTRUCTIONS}
+
+    This final output must be machine-readable and concise.
+    """
+
+    user_query = f"""
+    Find the transfer requirements for the major {major} at {university_name} using the search domain {domain}. 
+    Output the data in the requested raw text, delimited format.
+    """
+
+    return {
+        "contents": [{ "parts": [{ "text": user_query }] }],
+        "tools": [{ "google_search": {} }],
+        "systemInstruction": {
+            "parts": [{ "text": system_prompt }]
+        },
+    }
+
+def create_context_cache(ttl_seconds):
+    """
+    Stores the shared instructions and tools as a Gemini cachedContents
+    resource and returns its name, or None if the instructions are below
+    CONTEXT_CACHE_MIN_TOKENS (checked up front, from their length) or the
+    API declines.
+    """
+    body = {
+        "model": f"models/{MODEL_NAME}",
+        "displayName": "transfer-report-instructions",
+        "systemInstruction": {"parts": [{"text": build_system_prompt(SHARED_PROMPT_SUBJECT)}]},
+        "tools": [{ "google_search": {} }],
+        "ttl": f"{int(ttl_seconds)}s",
+    }
+    if JSON_OUTPUT:
+        body["systemInstruction"] = {"parts": [{"text": build_json_system_prompt(SHARED_PROMPT_SUBJECT)}]}
+        del body["tools"]
+    estimated_tokens = len(body["systemInstruction"]["parts"][0]["text"]) // CHARS_PER_TOKEN
+    if estimated_tokens < CONTEXT_CACHE_MIN_TOKENS:
+        print(f"⚠️  Warning: --context-cache has no effect here: the shared instructions are about "
+              f"{estimated_tokens} tokens, below the {CONTEXT_CACHE_MIN_TOKENS} tokens {MODEL_NAME} needs "
+              f"to cache them. Sending full prompts instead.")
+        return None
+    try:
+        response = HTTP_SESSION.post(
+            f"{API_BASE}/cachedContents",
+            params={"key": API_KEY},
+            data=json.dumps(body),
+            timeout=(LATENCY_TRACKER.timeout("connect"), 60)
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️  Warning: Could not create a context cache, sending full prompts instead: {e}")
+        return None
+    result = response.json()
+    print(f"Created context cache {result['name']} "
+          f"({result.get('usageMetadata', {}).get('totalTokenCount', '?')} tokens)")
+    return result["name"]
+
+def delete_context_cache(name):
+    """Delete a cachedContents resource early instead of paying for it until its TTL."""
+    try:
+        HTTP_SESSION.delete(f"{API_BASE}/{name}", params={"key": API_KEY},
+                            timeout=(LATENCY_TRACKER.timeout("connect"), 30)).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️  Warning: Could not delete context cache {name}: {e}")
+
+def extract_report_text(result):
+    """Pull the generated text out of a generateContent response."""
+    return result.get('candidates', [{}])[0] \
+                 .get('content', {}) \
+                 .get('parts', [{}])[0] \
+                 .get('text', 'Failed to generate report text.')
+
+def report_date(current_time, *results):
+    """
+    REPORT_DATE for a report built from `results`: `current_time`, unless
+    one came from RESPONSE_CACHE, in which case the oldest of those is when
+    the report's data was really fetched.
+    """
+    cached = [result["cachedAt"] for result in results if "cachedAt" in result]
+    if not cached:
+        return current_time
+    return min(current_time, datetime.fromtimestamp(min(cached)).strftime("%Y-%m-%d %H:%M:%S"))
+
+def report_header(university_name, domain, current_time):
+    """Metadata block prepended to the LLM's raw output."""
+    return f"--- UNIVERSITY_START ---\nNAME: {university_name}\nDOMAIN: {domain}\nREPORT_DATE: {current_time}\n"
+
+def failure_record(university_name, domain, current_time, error):
+    """Header-only report recording a failed attempt."""
+    if JSON_OUTPUT:
+        return json_failure_record(university_name, domain, current_time, error)
+    return report_header(university_name, domain, current_time) + f"STATUS: FAILED - {error}\n"
+
+def success_record(university_name, domain, current_time, result):
+    """Report for a generateContent response: header plus text, or a JSON record."""
+    if JSON_OUTPUT:
+        finish_reason = result.get('candidates', [{}])[0].get('finishReason')
+        return json_report(university_name, domain, current_time, extract_report_text(result), finish_reason)
+    return report_header(university_name, domain, current_time) + extract_report_text(result) + "\n"
+
+def continuation_payload(payload, prefix):
+    """The original request plus the trimmed answer so far and a request to carry on."""
+    return dict(payload, contents=payload["contents"] + [
+        { "role": "model", "parts": [{ "text": prefix }] },
+        { "role": "user", "parts": [{ "text": continuation_prompt(prefix) }] },
+    ])
+
+def continue_truncated(payload, text, finish_reason, label, key=None):
+    """
+    If a response was cut off (MAX_TOKENS, or a MAJOR_START block left
+    open), trim it to its last complete block and ask the model to continue
+    from there, up to MAX_CONTINUATIONS times. A response cut off before
+    its first complete block is simply requested again. Returns (text,
+    complete): the stitched report, and False if it still ends early, in
+    which case the text holds only the complete blocks.
+    """
+    for round_number in range(1, MAX_CONTINUATIONS + 1):
+        if not is_truncated(text, finish_reason):
+            return text, True
+        prefix = complete_prefix(text)
+
+        print(f"Response for {label} was cut off; requesting continuation "
+              f"{round_number}/{MAX_CONTINUATIONS}...")
+        request = continuation_payload(payload, prefix) if prefix else payload
         try:
-            if not API_KEY:
-                print("FATAL: API_KEY is missing. Skipping LLM call.")
-                return None
-                
-            response = requests.post(
-                API_URL, 
-                headers={'Content-Type': 'application/json'}, 
-                data=json.dumps(payload),
-                timeout=30 
+            result = RETRY_POLICY.call(
+                lambda: CIRCUIT_BREAKER.call(lambda: post_to_gemini(request, key=key)), label
             )
-            response.raise_for_status() 
-
-            result = response.json()
-            report_text = result.get('candidates', [{}])[0] \
-                              .get('content', {}) \
-                              .get('parts', [{}])[0] \
-                              .get('text', 'Failed to generate report text.')
-                            
-            # Prepend metadata to the LLM's raw output
-            header = f"""
---- UNIVERSITY_START ---
-NAME: {university_name}
-DOMAIN: {domain}
-REPORT_DATE: {current_time}
-"""
-            return header.strip() + "\n" + report_text + "\n"
-
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                delay = initial_delay * (2 ** attempt)
-                print(f"Request failed for {domain} (Attempt {attempt + 1}/{max_retries}). Retrying in {delay}s...")
-                time.sleep(delay)
-            else:
-                print(f"Failed to generate data for {domain} after {max_retries} attempts. Error: {e}")
-                return f"--- UNIVERSITY_START ---\nNAME: {university_name}\nDOMAIN: {domain}\nREPORT_DATE: {current_time}\nSTATUS: FAILED - {e}\n"
+        except (requests.exceptions.RequestException, DailyQuotaExceeded) as e:
+            print(f"⚠️  Warning: Could not continue the report for {label}: {e}")
+            return prefix, False
+        text = stitch(prefix, extract_report_text(result)) if prefix else extract_report_text(result)
+        finish_reason = result.get('candidates', [{}])[0].get('finishReason')
+
+    if is_truncated(text, finish_reason):
+        print(f"⚠️  Warning: Report for {label} is still cut off after {MAX_CONTINUATIONS} continuations.")
+        return complete_prefix(text), False
+    return text, True
+
+def incomplete_record(university_name, domain, current_time, text):
+    """Report whose blocks are complete but which ends before the last major."""
+    return (report_header(university_name, domain, current_time)
+            + "STATUS: INCOMPLETE - response cut off at the output limit\n" + text + "\n")
+
+def generate_transfer_data(university_name, domain):
+    """
+    Generates the report for one university and returns it as a delimited
+    text block, or a STATUS: FAILED record if every attempt failed.
+    A response cut off at the output limit is continued rather than
+    regenerated (see continue_truncated).
+    Raises CircuitOpenError if the endpoint is being held off.
+    """
+    
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    payload = build_payload(university_name, domain)
+
+    if not API_KEY:
+        print("FATAL: API_KEY is missing. Skipping LLM call.")
+        return None
+
+    def attempt():
+        result = post_to_gemini(payload, key=university_name)
+        date = report_date(current_time, result)
+        if JSON_OUTPUT:
+            return success_record(university_name, domain, date, result)
+        finish_reason = result.get('candidates', [{}])[0].get('finishReason')
+        text, complete = continue_truncated(payload, extract_report_text(result), finish_reason,
+                                            domain, key=university_name)
+        if not complete:
+            return incomplete_record(university_name, domain, date, text)
+        return report_header(university_name, domain, date) + text + "\n"
+
+    try:
+        return RETRY_POLICY.call(lambda: CIRCUIT_BREAKER.call(attempt), domain)
+    except CircuitOpenError:
+        # Not a failure of this university; the scheduler keeps it pending
+        raise
+    except DailyQuotaExceeded as e:
+        # Leave the university pending so a later run picks it up
+        print(f"Skipping {domain}: {e}.")
+        return None
+    except requests.exceptions.RequestException as e:
+        return failure_record(university_name, domain, current_time, e)
+    except Exception as e:
+        print(f"An unexpected error occurred for {domain}: {e}")
+        return failure_record(university_name, domain, current_time, e)
+
+def output_tokens(result):
+    """Tokens a response used against the output limit, thinking included."""
+    usage = result.get('usageMetadata', {})
+    return usage.get('candidatesTokenCount', 0) + usage.get('thoughtsTokenCount', 0)
+
+def generate_packed_data(pack, sizer):
+    """
+    Generates reports for a pack of (name, domain) pairs with one request.
+    Returns ({name: data_block}, leftover): the reports (or STATUS: FAILED
+    records) to save, and the pairs the response did not cover, which the
+    caller should queue again. Observed sizes are fed back into `sizer`.
+    Raises CircuitOpenError if the endpoint is being held off.
+    """
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    payload = build_packed_payload(pack)
+    domains = dict(pack)
+    label = f"a pack of {len(pack)} ({', '.join(domains.values())})"
+
+    if not API_KEY:
+        print("FATAL: API_KEY is missing. Skipping LLM call.")
+        return {}, []
+
+    def attempt():
+        return post_to_gemini(payload, key=f"pack of {len(pack)}", units=len(pack))
+
+    try:
+        result = RETRY_POLICY.call(lambda: CIRCUIT_BREAKER.call(attempt), label)
+    except CircuitOpenError:
+        raise
+    except DailyQuotaExceeded as e:
+        print(f"Skipping {label}: {e}.")
+        return {}, []
+    except Exception as e:
+        if not isinstance(e, requests.exceptions.RequestException):
+            print(f"An unexpected error occurred for {label}: {e}")
+        return {name: failure_record(name, domain, current_time, e) for name, domain in pack}, []
+
+    current_time = report_date(current_time, result)
+    text = extract_report_text(result)
+    bodies = split_packed_report(text, list(domains))
+    finish_reason = result.get('candidates', [{}])[0].get('finishReason')
+    if finish_reason == "MAX_TOKENS":
+        # The last report in the response was cut off; redo it rather than
+        # save half of it. The model may not keep the requested order, but
+        # split_packed_report returns sections in the order they were written.
+        sizer.record_truncated(len(pack))
+        if bodies:
+            del bodies[next(reversed(bodies))]
+
+    # Charge the output tokens to each report in proportion to its length
+    total_chars = sum(len(body) for body in bodies.values()) or 1
+    for name, body in bodies.items():
+        sizer.record(name, output_tokens(result) * len(body) / total_chars)
+
+    data_blocks = {
+        name: report_header(name, domains[name], current_time) + body + "\n"
+        for name, body in bodies.items()
+    }
+    leftover = [(name, domain) for name, domain in pack if name not in bodies]
+    return data_blocks, leftover
+
+def resumable_fan_out(university_name):
+    """
+    (report date, body, failed majors) of a university's stored fan-out
+    report if some of its majors failed and it is recent enough to finish
+    instead of regenerating (see MAX_REPORT_AGE_HOURS and --force); else None.
+    """
+    if FORCE_REFRESH:
+        return None
+    text = stored_report(university_name)
+    header = parse_report_header(text) if text else None
+    if not header or not has_failed_majors(header):
+        return None
+    age = report_age(header)
+    if age is None or age.total_seconds() > MAX_REPORT_AGE_HOURS * 3600:
+        return None
+    # The body follows the UNIVERSITY_START line and the header fields
+    body = text.split("\n", len(header) + 1)[-1].rstrip("\n")
+    majors = failed_majors(body)
+    return (header["REPORT_DATE"], body, majors) if majors else None
+
+def generate_fanned_out_data(university_name, domain):
+    """
+    Fan-out variant of generate_transfer_data: one call for the general
+    block and major list, then up to FAN_OUT_MAJOR_CONCURRENCY calls at a
+    time for the majors. A major whose call fails gets a STATUS: FAILED
+    block instead of failing the whole report, and the report is marked
+    STATUS: INCOMPLETE; the next run re-fetches only those majors.
+    Raises CircuitOpenError if the endpoint is being held off.
+    """
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if not API_KEY:
+        print("FATAL: API_KEY is missing. Skipping LLM call.")
+        return None
+
+    def call(payload, label):
+        return RETRY_POLICY.call(
+            lambda: CIRCUIT_BREAKER.call(lambda: post_to_gemini(payload, key=university_name)),
+            label
+        )
+
+    def fetch_major(major):
+        try:
+            result = call(build_major_payload(university_name, domain, major), f"{domain} ({major})")
+            dates.append(report_date(current_time, result))
+            return major_block(extract_report_text(result))
+        except (CircuitOpenError, DailyQuotaExceeded):
+            raise
         except Exception as e:
+            if not isinstance(e, requests.exceptions.RequestException):
+                print(f"An unexpected error occurred for {domain} ({major}): {e}")
+            failed.append(major)
+            return failed_major_block(major, e)
+
+    failed = []
+    dates = [current_time]
+    resumed = resumable_fan_out(university_name)
+
+    try:
+        if resumed:
+            # Keep the blocks that succeeded last time, and their date
+            stored_date, stored_body, majors = resumed
+            dates.append(stored_date)
+            print(f"Re-fetching {len(majors)} failed majors for {university_name}...")
+        else:
+            overview = call(build_overview_payload(university_name, domain), domain)
+            dates.append(report_date(current_time, overview))
+            general_info, majors = split_overview(extract_report_text(overview))
+            print(f"Found {len(majors)} majors for {university_name}; fetching them...")
+
+        with ThreadPoolExecutor(max_workers=FAN_OUT_MAJOR_CONCURRENCY) as executor:
+            blocks = list(executor.map(METRICS.bind(fetch_major), majors))
+    except CircuitOpenError:
+        raise
+    except DailyQuotaExceeded as e:
+        print(f"Skipping {domain}: {e}.")
+        return None
+    except requests.exceptions.RequestException as e:
+        return failure_record(university_name, domain, current_time, e)
+    except Exception as e:
+        print(f"An unexpected error occurred for {domain}: {e}")
+        return failure_record(university_name, domain, current_time, e)
+
+    if resumed:
+        body = replace_failed_majors(stored_body, dict(zip(majors, blocks)))
+    else:
+        body = assemble_report(general_info, blocks)
+    header = report_header(university_name, domain, min(dates))
+    if failed:
+        print(f"⚠️  Warning: {len(failed)} of {len(majors)} majors failed for {university_name}: "
+              f"{', '.join(failed)}")
+        header += f"STATUS: {failed_majors_status(len(failed))}\n"
+    return header + body + "\n"
+
+def stream_transfer_data(university_name, domain, file_path):
+    """
+    Streaming variant of generate_transfer_data: the report is written to
+    `file_path` chunk by chunk instead of being held in memory. Chunks go to
+    a .part file that only replaces `file_path` once the stream completes,
+    and only if text files are a chosen sink (see WRITE_TEXT_FILES).
+    Delimiters are counted as they arrive, so the file is only read back to
+    continue a truncated report or for REPORT_STORE, SEGMENT_LOG or
+    SEARCH_INDEX. Returns True if a report or failure record was written.
+    """
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    payload = build_payload(university_name, domain)
+    part_path = file_path + ".part"
+
+    if not API_KEY:
+        print("FATAL: API_KEY is missing. Skipping LLM call.")
+        return False
+
+    def attempt():
+        header = report_header(university_name, domain, current_time)
+        delimiters = DelimiterCounter()
+        with open(part_path, 'w', encoding='utf-8') as f:
+            f.write(header)
+            finish_reason = stream_from_gemini(payload, f, key=university_name, delimiters=delimiters)
+            f.write("\n")
+
+        outcome = "ok"
+        if delimiters.truncated(finish_reason):
+            # Continue with buffered requests and rewrite the stitched report
+            with open(part_path, 'r', encoding='utf-8') as f:
+                text = f.read()[len(header):].rstrip("\n")
+            text, complete = continue_truncated(payload, text, finish_reason, domain, key=university_name)
+            with open(part_path, 'w', encoding='utf-8') as f:
+                if complete:
+                    f.write(header + text + "\n")
+                else:
+                    f.write(incomplete_record(university_name, domain, current_time, text))
+                    outcome = "incomplete"
+        METRICS.finish(university_name, outcome)
+        if REPORT_STORE is not None or SEGMENT_LOG is not None or SEARCH_INDEX is not None:
+            with open(part_path, 'r', encoding='utf-8') as f:
+                store_report(university_name, f.read())
+        if not WRITE_TEXT_FILES:
+            # The .part file was only a buffer; leave any earlier file alone
+            return True
+        os.replace(part_path, file_path)
+        print(f"✅ Data streamed to {file_path}")
+        return True
+
+    try:
+        return RETRY_POLICY.call(lambda: CIRCUIT_BREAKER.call(attempt), domain)
+    except CircuitOpenError:
+        raise
+    except DailyQuotaExceeded as e:
+        print(f"Skipping {domain}: {e}.")
+        return False
+    except Exception as e:
+        if not isinstance(e, requests.exceptions.RequestException):
             print(f"An unexpected error occurred for {domain}: {e}")
-            return f"--- UNIVERSITY_START ---\nNAME: {university_name}\nDOMAIN: {domain}\nREPORT_DATE: {current_time}\nSTATUS: FAILED - {e}\n"
-    
-    return None
+        save_report(university_name, failure_record(university_name, domain, current_time, e))
+        return True
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+# -----------------------------------------------------------------------------
+# Output and Scheduling
+# -----------------------------------------------------------------------------
+
+def university_domain(uni):
+    """Extract the bare domain from a university entry's URL."""
+    return uni['url'].split('//')[1].split('/')[0]
+
+def report_path(university_name):
+    """Path of the report file for a university in COLLEGES_DIR."""
+    # Create a safe filename for this university
+    safe_filename = sanitize_filename(university_name)
+    return os.path.join(COLLEGES_DIR, safe_filename + report_extension())
+
+def report_extension():
+    return ".json" if JSON_OUTPUT else ".txt"
+
+# Reports are looked up in REPORT_STORE, then SEGMENT_LOG, then COLLEGES_DIR,
+# so files written before a sink was chosen (or with --sink text) still count.
+
+def stored_header(university_name):
+    """Header of a university's existing report, or None if it has none."""
+    header = None
+    if REPORT_STORE is not None:
+        header = REPORT_STORE.header(university_name)
+    if header is None and SEGMENT_LOG is not None:
+        header = SEGMENT_LOG.header(university_name)
+    if header is None:
+        header = read_report_header(report_path(university_name))
+    return header
+
+def stored_report_size(university_name):
+    """Length of a university's existing report, or None if it has none."""
+    size = None
+    if REPORT_STORE is not None:
+        size = REPORT_STORE.report_size(university_name)
+    if size is None and SEGMENT_LOG is not None:
+        size = SEGMENT_LOG.report_size(university_name)
+    if size is None:
+        try:
+            size = os.path.getsize(report_path(university_name))
+        except OSError:
+            pass
+    return size
+
+def stored_report(university_name):
+    """Text of a university's existing report, or None if it has none."""
+    text = None
+    if REPORT_STORE is not None:
+        text = REPORT_STORE.report(university_name)
+    if text is None and SEGMENT_LOG is not None:
+        text = SEGMENT_LOG.read(university_name)
+    if text is None:
+        try:
+            with open(report_path(university_name), 'r', encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            pass
+    return text
+
+def stored_headers():
+    """Header of every existing report, one per university, preferring the sinks as above."""
+    headers = {}
+    sources = []
+    if REPORT_STORE is not None:
+        sources.append(REPORT_STORE.headers())
+    if SEGMENT_LOG is not None:
+        sources.append(SEGMENT_LOG.header(name) for name in SEGMENT_LOG.names())
+    sources.append(read_report_headers(COLLEGES_DIR, report_extension()))
+    for source in sources:
+        for header in source:
+            if header and header.get("NAME"):
+                headers.setdefault(header["NAME"], header)
+    return list(headers.values())
+
+def store_report(university_name, data_block):
+    """Add a report to REPORT_STORE, SEGMENT_LOG and SEARCH_INDEX, whichever are in use."""
+    saved_to = []
+    if REPORT_STORE is not None:
+        try:
+            REPORT_STORE.save(data_block)
+            saved_to.append(REPORT_STORE.path)
+        except Exception as e:
+            print(f"❌ Error storing data for {university_name} in {REPORT_STORE.path}: {e}")
+    if SEGMENT_LOG is not None:
+        try:
+            SEGMENT_LOG.append(university_name, data_block)
+            saved_to.append(f"{SEGMENT_LOG.path}/")
+        except OSError as e:
+            print(f"❌ Error appending data for {university_name} to {SEGMENT_LOG.path}/: {e}")
+    if saved_to:
+        print(f"✅ Data saved to {' and '.join(saved_to)} ({university_name})")
+    if SEARCH_INDEX is not None:
+        try:
+            SEARCH_INDEX.add(university_name, data_block)
+        except sqlite3.Error as e:
+            print(f"⚠️  Warning: Could not index {university_name} in {SEARCH_INDEX.path}: {e}")
+
+def save_report(university_name, data_block):
+    """Store a generated report in every sink chosen with --sink."""
+    METRICS.finish_report(university_name, data_block)
+    store_report(university_name, data_block)
+    if not WRITE_TEXT_FILES:
+        return
+
+    file_path = report_path(university_name)
+
+    # Check if file exists and handle appropriately
+    existed = os.path.exists(file_path)
+    if existed:
+        print(f"⚠️  Warning: File already exists for {university_name}, overwriting...")
+
+    # Save the data to an individual file
+    try:
+        # Open in write mode, which will overwrite any existing file
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(data_block)
+        print(f"✅ Data {'updated' if existed else 'saved'} to {file_path}")
+    except PermissionError as e:
+        print(f"❌ Error: No permission to write to {file_path}: {e}")
+    except IOError as e:
+        print(f"❌ Error saving data for {university_name}: {e}")
+    except Exception as e:
+        print(f"❌ Unexpected error while saving data for {university_name}: {e}")
+
+async def wait_for_dispatch():
+    """
+    Wait until CIRCUIT_BREAKER lets new work start. Returns False once the
+    breaker has opened BREAKER_MAX_TRIPS times and the run should wind down.
+    """
+    while True:
+        # Checked first: a worker back from a long retry wait would otherwise
+        # find the cooldown over and become the half-open probe
+        if CIRCUIT_BREAKER.trips >= BREAKER_MAX_TRIPS:
+            return False
+        if CIRCUIT_BREAKER.try_dispatch():
+            return True
+        await asyncio.sleep(min(1.0, max(0.1, CIRCUIT_BREAKER.seconds_until_probe())))
+
+def worker_threads(concurrency):
+    """
+    Executor for the blocking calls of run_all and run_packed: a thread for
+    each of `concurrency` reports in progress, and as many again for saving
+    finished ones. asyncio's default executor is capped at cpu_count + 4
+    threads, which would quietly lower --concurrency on small machines.
+    """
+    return ThreadPoolExecutor(max_workers=2 * concurrency, thread_name_prefix="worker")
+
+async def run_all(universities, concurrency, stream=False, fan_out=False):
+    """
+    Generates reports for all universities, running up to `concurrency`
+    requests at once. The blocking HTTP calls run in worker threads; the
+    shared RATE_LIMITER keeps the overall request rate within quota.
+    With `stream`, reports are written to disk as they are generated; with
+    `fan_out`, each report is assembled from per-major calls.
+
+    While the circuit breaker is open, universities wait instead of being
+    marked failed; if the endpoint stays down they are left pending (no
+    file is written) for the next run to pick up. So are universities
+    skipped once the daily quota is used up. Returns the number of
+    universities a report or failure record was saved for.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(universities)
+    processed = 0
+    pending = []
+    skipped = []
+    loop = asyncio.get_running_loop()
+    executor = worker_threads(concurrency)
+
+    async def process(index, uni):
+        nonlocal processed
+        name = uni['college_name']
+        # Use the domain from the URL
+        domain = university_domain(uni)
+
+        async with semaphore:
+            while True:
+                if not await wait_for_dispatch():
+                    pending.append(name)
+                    return
+                print(f"\n[{index + 1}/{total}] Processing {name} ({domain})...")
+
+                try:
+                    if stream:
+                        saved = await loop.run_in_executor(executor, METRICS.run_as, [name], stream_transfer_data,
+                                                           name, domain, report_path(name))
+                        data_block = None
+                    elif fan_out:
+                        data_block = await loop.run_in_executor(
+                            executor, METRICS.run_as, [name], generate_fanned_out_data, name, domain
+                        )
+                    else:
+                        # Generate the raw data for the university
+                        data_block = await loop.run_in_executor(
+                            executor, METRICS.run_as, [name], generate_transfer_data, name, domain
+                        )
+                    break
+                except CircuitOpenError:
+                    print(f"Holding {name} until the circuit breaker closes...")
+
+        if data_block:
+            await loop.run_in_executor(executor, save_report, name, data_block)
+        elif not (stream and saved):
+            skipped.append(name)
+            return
+
+        processed += 1
+
+    with executor:
+        await asyncio.gather(*(process(i, uni) for i, uni in enumerate(universities)))
+
+    if pending:
+        print(f"\n⚠️  The API kept failing; {len(pending)} universities were left pending. "
+              f"Rerun later to resume with just these.")
+    if skipped:
+        print(f"\n⚠️  {len(skipped)} universities were skipped without a report; "
+              f"rerun later to resume with just these.")
+    return processed
+
+async def run_packed(universities, concurrency, max_pack):
+    """
+    Like run_all, but packs up to `max_pack` universities into each request.
+    Pack sizes come from a PackSizer seeded with the sizes of earlier
+    reports and kept under MAX_OUTPUT_TOKENS as responses arrive.
+    Universities a response leaves out are queued again on their own; a
+    pack of one goes through generate_transfer_data, so a report cut off
+    at the output limit is continued rather than failed.
+    """
+    sizer = PackSizer(MAX_OUTPUT_TOKENS, max_pack, PACK_OUTPUT_HEADROOM)
+    queue = deque()
+    for uni in universities:
+        name = uni['college_name']
+        header = stored_header(name)
+        size = stored_report_size(name)
+        if header is not None and not is_failed(header) and size:
+            sizer.seed(name, size)
+        queue.append((name, university_domain(uni)))
+
+    processed = 0
+    pending = []
+    retry_alone = set()
+    loop = asyncio.get_running_loop()
+    executor = worker_threads(concurrency)
+
+    async def worker():
+        nonlocal processed
+        while queue:
+            if not await wait_for_dispatch():
+                pending.extend(name for name, _ in queue)
+                queue.clear()
+                return
+            pack = [queue.popleft()] if queue[0][0] in retry_alone else sizer.take(queue)
+            names = ", ".join(name for name, _ in pack)
+            print(f"\nProcessing {names} ({len(queue)} more queued)...")
+
+            try:
+                if len(pack) == 1:
+                    # A pack of one is a plain request, which continue_truncated
+                    # can finish if the report is cut off
+                    name, domain = pack[0]
+                    data_block = await loop.run_in_executor(
+                        executor, METRICS.run_as, [name], generate_transfer_data, name, domain
+                    )
+                    data_blocks, leftover = ({name: data_block} if data_block else {}), []
+                else:
+                    data_blocks, leftover = await loop.run_in_executor(
+                        executor, METRICS.run_as, [name for name, _ in pack], generate_packed_data, pack, sizer
+                    )
+            except CircuitOpenError:
+                print(f"Holding {names} until the circuit breaker closes...")
+                queue.extendleft(reversed(pack))
+                continue
+
+            for name, data_block in data_blocks.items():
+                await loop.run_in_executor(executor, save_report, name, data_block)
+            processed += len(data_blocks)
+
+            if leftover:
+                print(f"⚠️  Warning: No complete report for {len(leftover)} of {len(pack)} packed "
+                      f"universities; retrying them one at a time.")
+                retry_alone.update(name for name, _ in leftover)
+                queue.extendleft(reversed(leftover))
+
+    with executor:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    if pending:
+        print(f"\n⚠️  The API kept failing; {len(pending)} universities were left pending. "
+              f"Rerun later to resume with just these.")
+    return processed
+
+def run_batch(universities, batch_file, poll_interval, batch_name=None):
+    """
+    Generates every report through the Batch API: writes one request per
+    university to `batch_file`, submits it as a batch job (or resumes polling
+    `batch_name`), then fans the results back out into COLLEGES_DIR.
+    Returns the number of reports saved.
+    """
+    client = BatchClient(HTTP_SESSION, API_BASE, API_KEY, MODEL_NAME)
+    domains = {uni['college_name']: university_domain(uni) for uni in universities}
+
+    try:
+        if not batch_name:
+            count = write_batch_requests(
+                batch_file,
+                ((name, build_payload(name, domain)) for name, domain in domains.items())
+            )
+            print(f"Wrote {count} batch requests to {batch_file}")
+
+            display_name = f"transfer-reports-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            file_name = client.upload_file(batch_file, display_name)
+            batch_name = client.create_batch(file_name, display_name)
+            print(f"Submitted {batch_name}; rerun with --batch-name {batch_name} to resume polling")
+
+        batch = client.wait_for_batch(batch_name, poll_interval)
+        saved = 0
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for name, response, error in client.iter_results(batch):
+            if name not in domains:
+                print(f"⚠️  Warning: Ignoring batch result for unknown key {name!r}")
+                continue
+            domain = domains.pop(name)
+            if error:
+                data_block = failure_record(name, domain, current_time, error.get('message', error))
+            else:
+                try:
+                    data_block = success_record(name, domain, current_time, response)
+                except ValueError as e:
+                    data_block = failure_record(name, domain, current_time, e)
+            save_report(name, data_block)
+            saved += 1
+    except (BatchError, requests.exceptions.RequestException) as e:
+        print(f"FATAL: Batch run failed: {e}")
+        return 0
+
+    for name in domains:
+        print(f"⚠️  Warning: No batch result for {name}")
+    return saved
+
+async def retry_failed(concurrency):
+    """
+    Re-runs only the universities whose stored reports (in REPORT_STORE,
+    SEGMENT_LOG or COLLEGES_DIR, in that order of preference) are
+    STATUS: FAILED records or fanned-out reports with failed majors, one
+    pass per failure class, each with the backoff and concurrency from
+    FAILURE_RETRY_PLAN.
+    Returns the number of universities processed.
+    """
+    failures = group_failures(stored_headers())
+    if not failures:
+        sources = [f"{COLLEGES_DIR}/"]
+        if SEGMENT_LOG is not None:
+            sources.insert(0, f"{SEGMENT_LOG.path}/")
+        if REPORT_STORE is not None:
+            sources.insert(0, REPORT_STORE.path)
+        print(f"No failure records found in {' or '.join(sources)}.")
+        return 0
+
+    processed = 0
+    for failure_class, (delay, class_concurrency) in FAILURE_RETRY_PLAN.items():
+        headers = failures.get(failure_class)
+        if not headers:
+            continue
+        universities = [
+            {'college_name': h['NAME'], 'url': f"https://{h['DOMAIN']}/"} for h in headers
+        ]
+        # Only wait out whatever part of the backoff has not already elapsed
+        ages = [report_age(h) for h in headers]
+        newest = min((age.total_seconds() for age in ages if age is not None), default=0)
+        wait = max(0, delay - newest)
+        if wait:
+            print(f"\nPausing {wait:.0f}s before retrying {failure_class} failures...")
+            await asyncio.sleep(wait)
+        print(f"\nRetrying {len(universities)} {failure_class} failure(s)...")
+        processed += await run_all(
+            universities,
+            min(concurrency, class_concurrency or concurrency),
+            stream=(failure_class == "timeout" and not JSON_OUTPUT),
+            fan_out=(failure_class == "failed_majors")
+        )
+    return processed
 
 # -----------------------------------------------------------------------------
 # Execution
 # -----------------------------------------------------------------------------
 
+def print_metrics_summary():
+    lines = METRICS.summary()
+    if lines:
+        print("\n".join(lines))
+        print(f"Per-university metrics appended to {METRICS.path}")
+
+def parse_sinks(value):
+    sinks = tuple(sink.strip() for sink in value.split(",") if sink.strip())
+    unknown = [sink for sink in sinks if sink not in REPORT_SINKS]
+    if unknown or not sinks:
+        raise argparse.ArgumentTypeError(
+            f"expected a comma-separated list of {', '.join(REPORT_SINKS)}, got {value!r}"
+        )
+    return sinks
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate transfer requirement reports for a list of universities."
+    )
+    parser.add_argument(
+        "--input", default=UNIVERSITY_JSON_FILENAME,
+        help=f"JSON file with the university list (default: {UNIVERSITY_JSON_FILENAME})"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of universities processed at once (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--max-age-hours", type=float, default=MAX_REPORT_AGE_HOURS,
+        help=f"Skip universities whose successful report is newer than this (default: {MAX_REPORT_AGE_HOURS})"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Regenerate every report, even fresh ones, without reusing cached responses"
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true",
+        help="Only re-run universities whose stored report is a STATUS: FAILED record, "
+             "or a --fan-out report with failed majors"
+    )
+    parser.add_argument(
+        "--sink", type=parse_sinks, default=("sqlite",), metavar="SINKS",
+        help=f"Comma-separated places reports go: sqlite (the --db database), text (one file each "
+             f"in {COLLEGES_DIR}/) and/or log (append-only segments in --log-dir). Default: sqlite; "
+             f"storage.py export and segment_log.py export write the files later"
+    )
+    parser.add_argument(
+        "--db", default=REPORTS_DB_FILENAME,
+        help=f"SQLite database for --sink sqlite (default: {REPORTS_DB_FILENAME})"
+    )
+    parser.add_argument(
+        "--log-dir", default=SEGMENT_LOG_DIR,
+        help=f"Segment log directory for --sink log (default: {SEGMENT_LOG_DIR})"
+    )
+    parser.add_argument(
+        "--search-index", action="store_true",
+        help=f"Add every saved report to the full-text index in {SEARCH_INDEX_FILENAME} "
+             f"(query it with search_index.py)"
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Use streamGenerateContent and write each report to disk as it arrives"
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Generate all reports through a single Gemini Batch API job"
+    )
+    parser.add_argument(
+        "--batch-file", default=BATCH_REQUESTS_FILENAME,
+        help=f"JSONL file the batch requests are written to (default: {BATCH_REQUESTS_FILENAME})"
+    )
+    parser.add_argument(
+        "--batch-name",
+        help="Resume polling an already submitted batch job (e.g. batches/123) instead of submitting"
+    )
+    parser.add_argument(
+        "--batch-poll-interval", type=float, default=BATCH_POLL_INTERVAL_SECONDS,
+        help=f"Seconds between batch status checks (default: {BATCH_POLL_INTERVAL_SECONDS})"
+    )
+    parser.add_argument(
+        "--json", action="store_true",
+        help="Request structured JSON (responseSchema) and store reports as compact .json files. "
+             "Gemini 2.5 cannot use Google Search together with JSON output, so this runs ungrounded"
+    )
+    parser.add_argument(
+        "--pack", type=int, default=1, metavar="MAX",
+        help="Ask for up to MAX universities per request, sized from observed report lengths "
+             "(buffered mode only; default: 1, no packing)"
+    )
+    parser.add_argument(
+        "--fan-out", action="store_true",
+        help="Fetch the general info and major list first, then each major with its own smaller call"
+    )
+    parser.add_argument(
+        "--hedge", action="store_true",
+        help="Race a duplicate request against unusually slow ones (buffered mode only)"
+    )
+    parser.add_argument(
+        "--hedge-max-percent", type=float, default=HEDGE_MAX_PERCENT,
+        help=f"Most extra requests hedging may add, as a percentage (default: {HEDGE_MAX_PERCENT})"
+    )
+    parser.add_argument(
+        "--context-cache", action="store_true",
+        help="Send the shared instructions once as a cached context and only per-university queries after that "
+             f"(only if they reach the {CONTEXT_CACHE_MIN_TOKENS}-token minimum the API caches)"
+    )
+    parser.add_argument(
+        "--metrics", default=METRICS_FILENAME,
+        help=f"JSONL file that per-university request metrics are appended to (default: {METRICS_FILENAME})"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always call the API instead of reusing cached responses"
+    )
+    parser.add_argument(
+        "--cache-dir", default=RESPONSE_CACHE_DIR,
+        help=f"Directory for cached responses (default: {RESPONSE_CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--cache-ttl-hours", type=float, default=RESPONSE_CACHE_TTL_HOURS,
+        help=f"How long a cached response stays valid (default: {RESPONSE_CACHE_TTL_HOURS})"
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=RESPONSE_CACHE_MAX_MB,
+        help=f"Size limit of the response cache (default: {RESPONSE_CACHE_MAX_MB})"
+    )
+    parser.add_argument(
+        "--api-base", default=DEFAULT_API_BASE,
+        help="Base URL of the Gemini API, e.g. a local stub_server.py instance"
+    )
+    parser.add_argument(
+        "--max-attempts", type=int, default=MAX_ATTEMPTS,
+        help=f"Attempts per request for retryable errors (default: {MAX_ATTEMPTS})"
+    )
+    parser.add_argument(
+        "--breaker-threshold", type=int, default=BREAKER_FAILURE_THRESHOLD,
+        help=f"Consecutive failures that pause dispatch (default: {BREAKER_FAILURE_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--breaker-cooldown", type=float, default=BREAKER_RESET_SECONDS,
+        help=f"Seconds to pause before a probe request (default: {BREAKER_RESET_SECONDS})"
+    )
+    parser.add_argument(
+        "--rpm", type=float, default=GEMINI_REQUESTS_PER_MINUTE,
+        help=f"Gemini requests-per-minute quota (default: {GEMINI_REQUESTS_PER_MINUTE})"
+    )
+    parser.add_argument(
+        "--tpm", type=int, default=GEMINI_TOKENS_PER_MINUTE,
+        help=f"Gemini tokens-per-minute quota (default: {GEMINI_TOKENS_PER_MINUTE})"
+    )
+    parser.add_argument(
+        "--rpd", type=int, default=GEMINI_REQUESTS_PER_DAY,
+        help=f"Gemini requests-per-day quota, 0 for unlimited (default: {GEMINI_REQUESTS_PER_DAY})"
+    )
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.max_attempts < 1:
+        parser.error("--max-attempts must be at least 1")
+    if args.rpm <= 0 or args.tpm <= 0:
+        parser.error("--rpm and --tpm must be positive")
+    if args.fan_out and (args.stream or args.pack > 1):
+        parser.error("--fan-out cannot be combined with --stream or --pack")
+    if args.json and (args.stream or args.pack > 1 or args.fan_out):
+        parser.error("--json cannot be combined with --stream, --pack or --fan-out")
+    return args
+
 if __name__ == "__main__":
-    
-    CALIFORNIA_UNIVERSITIES = load_university_data(UNIVERSITY_JSON_FILENAME)
+    args = parse_args()
+    API_BASE = args.api_base.rstrip("/")
+    LATENCY_TRACKER.load(endpoint_state_path(LATENCY_STATS_FILENAME))
+    atexit.register(LATENCY_TRACKER.save, endpoint_state_path(LATENCY_STATS_FILENAME))
+    METRICS = MetricsCollector(args.metrics)
+    atexit.register(METRICS.close)
+    JSON_OUTPUT = args.json
+    FORCE_REFRESH = args.force
+    MAX_REPORT_AGE_HOURS = args.max_age_hours
+    WRITE_TEXT_FILES = "text" in args.sink
+    if "sqlite" in args.sink:
+        REPORT_STORE = ReportStore(args.db)
+        atexit.register(REPORT_STORE.close)
+    if "log" in args.sink:
+        SEGMENT_LOG = SegmentLog(args.log_dir)
+        atexit.register(SEGMENT_LOG.close)
+    if args.search_index:
+        SEARCH_INDEX = SearchIndex(SEARCH_INDEX_FILENAME)
+        atexit.register(SEARCH_INDEX.close)
+    RATE_LIMITER = RateLimiter(args.rpm, args.tpm, args.rpd)
+    RATE_LIMITER.load(endpoint_state_path(RATE_LIMIT_STATE_FILENAME))
+    atexit.register(RATE_LIMITER.save, endpoint_state_path(RATE_LIMIT_STATE_FILENAME))
+    HTTP_SESSION = create_http_session(
+        args.concurrency * (FAN_OUT_MAJOR_CONCURRENCY if args.fan_out else 1)
+    )
+    RETRY_POLICY = RetryPolicy(args.max_attempts, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS, RETRY_BUDGET_RATIO,
+                               on_retry=record_retry)
+    CIRCUIT_BREAKER = create_circuit_breaker(args.breaker_threshold, args.breaker_cooldown)
+    if args.hedge:
+        HEDGE_BUDGET = HedgeBudget(args.hedge_max_percent)
+    if not args.no_cache:
+        RESPONSE_CACHE = ResponseCache(args.cache_dir, args.cache_ttl_hours * 3600,
+                                       int(args.cache_max_mb * 1024 * 1024))
+
+    if args.retry_failed:
+        total_processed = asyncio.run(retry_failed(args.concurrency))
+        print(f"\n✅ Retry pass complete. Universities retried: {total_processed}")
+        print_metrics_summary()
+        exit()
+
+    CALIFORNIA_UNIVERSITIES = load_university_data(args.input)
     
     if not CALIFORNIA_UNIVERSITIES:
         print("Script stopped due to missing or invalid university data.")
         # If the script is run in a separate environment, we need to ensure the JSON file is present.
-        print(f"Please ensure '{UNIVERSITY_JSON_FILENAME}' is in the same directory.")
+        print(f"Please ensure '{args.input}' is in the same directory.")
         exit()
 
-    print(f"Starting database generation for {len(CALIFORNIA_UNIVERSITIES)} California universities...")
-    
-    total_processed = 0
-    
-    for uni in CALIFORNIA_UNIVERSITIES:
-        name = uni['college_name']
-        # Use the domain from the URL
-        domain = uni['url'].split('//')[1].split('/')[0]
-        
-        print(f"\n[{total_processed + 1}/{len(CALIFORNIA_UNIVERSITIES)}] Processing {name} ({domain})...")
-        
-        # Generate the raw data for the university
-        data_block = generate_transfer_data(name, domain)
+    if not args.force:
+        pending = pending_universities(CALIFORNIA_UNIVERSITIES, stored_header, args.max_age_hours)
+        skipped = len(CALIFORNIA_UNIVERSITIES) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} universities with reports newer than {args.max_age_hours:g}h "
+                  f"(use --force to regenerate them).")
+        CALIFORNIA_UNIVERSITIES = pending
 
-        if data_block:
-            # Create a safe filename for this university
-            safe_filename = sanitize_filename(name)
-            file_path = os.path.join(COLLEGES_DIR, f"{safe_filename}.txt")
-            
-            # Check if file exists and handle appropriately
-            if os.path.exists(file_path):
-                print(f"⚠️  Warning: File already exists for {name}, overwriting...")
-            
-            # Save the data to an individual file
-            try:
-                # Open in write mode, which will overwrite any existing file
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(data_block)
-                print(f"✅ Data {'updated' if os.path.exists(file_path) else 'saved'} to {file_path}")
-            except PermissionError as e:
-                print(f"❌ Error: No permission to write to {file_path}: {e}")
-            except IOError as e:
-                print(f"❌ Error saving data for {name}: {e}")
-            except Exception as e:
-                print(f"❌ Unexpected error while saving data for {name}: {e}")
-            
-        total_processed += 1
+    if not CALIFORNIA_UNIVERSITIES:
+        print("All reports are up to date.")
+        exit()
+
+    if args.batch or args.batch_name:
+        if not API_KEY:
+            print("FATAL: API_KEY is missing. Cannot submit a batch job.")
+            exit()
+        print(f"Starting batch generation for {len(CALIFORNIA_UNIVERSITIES)} California universities...")
+        total_processed = run_batch(CALIFORNIA_UNIVERSITIES, args.batch_file,
+                                    args.batch_poll_interval, args.batch_name)
+    else:
+        print(f"Starting database generation for {len(CALIFORNIA_UNIVERSITIES)} California universities "
+              f"(concurrency {args.concurrency}, {args.rpm:g} requests/min)...")
         
-        # Mandated politeness delay
-        if total_processed < len(CALIFORNIA_UNIVERSITIES):
-            print(f"Pausing for {POLITENESS_DELAY_SECONDS} seconds...")
-            time.sleep(POLITENESS_DELAY_SECONDS) 
+        # Fanned-out calls carry their own, smaller instructions
+        if args.context_cache and not args.fan_out:
+            CONTEXT_CACHE_NAME = create_context_cache(CONTEXT_CACHE_TTL_SECONDS)
+        try:
+            if args.pack > 1 and not args.stream:
+                total_processed = asyncio.run(
+                    run_packed(CALIFORNIA_UNIVERSITIES, args.concurrency, args.pack)
+                )
+            else:
+                total_processed = asyncio.run(
+                    run_all(CALIFORNIA_UNIVERSITIES, args.concurrency,
+                            stream=args.stream, fan_out=args.fan_out)
+                )
+        finally:
+            if CONTEXT_CACHE_NAME:
+                delete_context_cache(CONTEXT_CACHE_NAME)
 
     print("\n" + "="*80)
     print(f"✅ Database Generation Complete! Total universities processed: {total_processed}")
-    print(f"Output saved to {COLLEGES_DIR}/ directory")
+    if REPORT_STORE is not None:
+        print(f"Output saved to {REPORT_STORE.path}")
+    if SEGMENT_LOG is not None:
+        print(f"Output saved to {SEGMENT_LOG.path}/ segment log")
+    if WRITE_TEXT_FILES:
+        print(f"Output saved to {COLLEGES_DIR}/ directory")
     print("="*80)
+    print_metrics_summary()
@@ -0,0 +1,230 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from checkpoint import parse_report_header
+
+# -----------------------------------------------------------------------------
+# Per-University Request Metrics
+# -----------------------------------------------------------------------------
+#
+# Every HTTP request made while generating a report is charged to the
+# universities it is for, and when the report is saved one JSONL record is
+# written per university:
+#
+#   {"name": "Baylor University", "outcome": "ok", "requests": 3, "retries": 1,
+#    "hedges_cancelled": 0, "cache_hits": 0, "connect_s": 0.21, "ttfb_s": 41.8,
+#    "request_s": 97.3, "total_s": 104.9, "prompt_tokens": 1520,
+#    "candidate_tokens": 14210, "total_tokens": 16730, "response_bytes": 61442}
+#
+# connect_s is TCP+TLS setup on new connections, ttfb_s the first request's
+# wait for its first byte (or first streamed event), request_s the time
+# spent in requests, and total_s the wall time from the first request to
+# the save. A packed request counts as a request for each of its
+# universities, with its tokens and bytes split evenly. Outcomes are "ok", "incomplete", "failed", or
+# "pending" for universities left unsaved when the run ends.
+#
+# "retries" counts the retries RetryPolicy made (see record_retry), not failed
+# requests. A hedged request that lost the race (see hedging.py) is counted
+# under "hedges_cancelled", not as a request or a retry, and a request that
+# ends after its university's record was written is not charged at all.
+#
+# Which universities a request is for is thread-local: the scheduler runs
+# each generate_* call under run_as(), and work handed to other threads
+# goes through bind().
+
+PERCENTILES = (0.5, 0.95, 0.99)
+TOKEN_FIELDS = (("promptTokenCount", "prompt_tokens"), ("candidatesTokenCount", "candidate_tokens"),
+                ("totalTokenCount", "total_tokens"))
+
+def percentile(ordered, q):
+    """Nearest-rank q-quantile of a sorted list."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def report_outcome(data_block):
+    status = (parse_report_header(data_block) or {}).get("STATUS", "")
+    if status.startswith("FAILED"):
+        return "failed"
+    if status.startswith("INCOMPLETE"):
+        return "incomplete"
+    return "ok"
+
+class MetricsCollector:
+    """
+    Collects request metrics per university and writes one JSONL record to
+    `path` (if given) as each report is saved. Thread-safe.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._accounts = {}
+        self._finished = []
+        self._closed = set()
+        self._started = None
+        self._current = threading.local()
+        self._lock = threading.Lock()
+
+    # -- Attribution --------------------------------------------------------------
+
+    def current(self):
+        return getattr(self._current, "names", ())
+
+    @contextmanager
+    def track(self, names):
+        """Charge requests made by this thread to `names` until the block exits."""
+        previous = self.current()
+        self._current.names = tuple(names)
+        try:
+            yield
+        finally:
+            self._current.names = previous
+
+    def run_as(self, names, fn, *args):
+        with self.track(names):
+            return fn(*args)
+
+    def bind(self, fn):
+        """Wrap `fn` so it charges the current thread's universities from whichever thread runs it."""
+        names = self.current()
+        return lambda *args: self.run_as(names, fn, *args)
+
+    @staticmethod
+    def _new_account():
+        return {
+            "requests": 0, "retries": 0, "hedges_cancelled": 0, "cache_hits": 0, "connect_s": 0.0, "ttfb_s": None,
+            "request_s": 0.0, "prompt_tokens": 0, "candidate_tokens": 0, "total_tokens": 0,
+            "response_bytes": 0, "started": time.perf_counter(),
+        }
+
+    def _account(self, name):
+        account = self._accounts.get(name)
+        if account is None:
+            account = self._accounts[name] = self._new_account()
+        return account
+
+    # -- Recording ----------------------------------------------------------------
+
+    def _open_names(self):
+        """The current thread's universities whose records have not been written yet."""
+        return [name for name in self.current() if name not in self._closed]
+
+    def record_connect(self, seconds):
+        with self._lock:
+            for name in self._open_names():
+                self._account(name)["connect_s"] += seconds
+
+    def record_cache_hit(self):
+        with self._lock:
+            for name in self._open_names():
+                self._account(name)["cache_hits"] += 1
+
+    def record_retry(self):
+        with self._lock:
+            for name in self._open_names():
+                self._account(name)["retries"] += 1
+
+    def record_request(self, ttfb, seconds, usage=None, response_bytes=0, cancelled=False):
+        """
+        One finished (or failed) request: first-byte and total seconds,
+        usageMetadata, body size. A `cancelled` hedge is only counted.
+        """
+        names = self.current()
+        if not names:
+            return
+        share = len(names)
+        with self._lock:
+            names = self._open_names()
+            if cancelled:
+                for name in names:
+                    self._account(name)["hedges_cancelled"] += 1
+                return
+            if self._started is None:
+                self._started = time.perf_counter() - seconds
+            for name in names:
+                account = self._account(name)
+                account["started"] = min(account["started"], time.perf_counter() - seconds)
+                account["requests"] += 1
+                account["request_s"] += seconds
+                if account["ttfb_s"] is None and ttfb is not None:
+                    account["ttfb_s"] = ttfb
+                for usage_key, field in TOKEN_FIELDS:
+                    account[field] += (usage or {}).get(usage_key, 0) / share
+                account["response_bytes"] += response_bytes / share
+
+    def finish(self, name, outcome):
+        """Close a university's account and write its record."""
+        with self._lock:
+            account = self._accounts.pop(name, None) or self._new_account()
+            self._closed.add(name)
+            record = {
+                "name": name,
+                "outcome": outcome,
+                "requests": account["requests"],
+                "retries": account["retries"],
+                "hedges_cancelled": account["hedges_cancelled"],
+                "cache_hits": account["cache_hits"],
+                "connect_s": round(account["connect_s"], 3),
+                "ttfb_s": None if account["ttfb_s"] is None else round(account["ttfb_s"], 3),
+                "request_s": round(account["request_s"], 3),
+                "total_s": round(time.perf_counter() - account["started"], 3) if account["requests"] else 0.0,
+                "prompt_tokens": round(account["prompt_tokens"]),
+                "candidate_tokens": round(account["candidate_tokens"]),
+                "total_tokens": round(account["total_tokens"]),
+                "response_bytes": round(account["response_bytes"]),
+            }
+            self._finished.append(record)
+            if self._file:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def finish_report(self, name, data_block):
+        self.finish(name, report_outcome(data_block))
+
+    def close(self):
+        """Record universities that made requests but were never saved as pending."""
+        with self._lock:
+            pending = [name for name, account in self._accounts.items() if account["requests"]]
+        for name in pending:
+            self.finish(name, "pending")
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # -- Summary ------------------------------------------------------------------
+
+    def summary(self):
+        """Run summary lines: outcomes, latency percentiles and throughput."""
+        with self._lock:
+            records = list(self._finished)
+            elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        if not records:
+            return []
+
+        outcomes = {}
+        for record in records:
+            outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+        lines = [f"{len(records)} universities: " + ", ".join(f"{n} {o}" for o, n in sorted(outcomes.items()))]
+
+        for field, label in (("total_s", "total"), ("ttfb_s", "ttfb"), ("connect_s", "connect")):
+            values = sorted(r[field] for r in records if r[field] is not None and r["requests"])
+            if values:
+                lines.append(f"  {label + ' latency':<16}" + "  ".join(
+                    f"p{round(q * 100)} {percentile(values, q):7.2f}s" for q in PERCENTILES
+                ))
+
+        requests = sum(r["requests"] for r in records)
+        retries = sum(r["retries"] for r in records)
+        hedges = sum(r["hedges_cancelled"] for r in records)
+        tokens = sum(r["total_tokens"] for r in records)
+        candidate_tokens = sum(r["candidate_tokens"] for r in records)
+        response_mb = sum(r["response_bytes"] for r in records) / 1e6
+        hedged = f", {hedges} cancelled hedges" if hedges else ""
+        lines.append(f"  {requests} requests ({retries} retries{hedged}), {tokens:,} tokens "
+                     f"({candidate_tokens:,} output), {response_mb:.1f} MB of responses")
+        if elapsed > 0:
+            lines.append(f"  throughput      {len(records) / elapsed * 60:.1f} universities/min, "
+                         f"{tokens / elapsed:,.0f} tokens/s, {candidate_tokens / elapsed:,.0f} output tokens/s "
+                         f"over {elapsed:.0f}s")
+        return lines
@@ -0,0 +1,310 @@
+import argparse
+import re
+import time
+from array import array
+from datetime import date
+
+from report_parser import GeneralInfo, University
+from storage import DEFAULT_DB_FILENAME, ReportStore, read_report_records, report_records
+from search_index import report_files
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # Columns stay array.array and queries fall back to Python loops
+
+# -----------------------------------------------------------------------------
+# Numeric Field Normalizer
+# -----------------------------------------------------------------------------
+#
+# Pulls typed values out of the prose in each report's general block:
+#
+#   min_gpa              "2.75 minimum cumulative GPA ..."             -> 2.75
+#   fall_deadline        "Fall: June 1; Spring: November 15; ..."      -> June 1
+#   spring_deadline                                                    -> November 15
+#   max_transfer_units   "A maximum of 70 semester hours ..."          -> 70.0
+#
+# and stores them as one column per field, so corpus-wide filters are
+# single vectorized comparisons. With numpy installed the columns are numpy
+# arrays (float64, datetime64[D]); without it they are array.array columns
+# with the same contents.
+#
+# A key with nothing after it ("Minimum GPA:" followed by one "College:
+# 3.5 ..." line per college) takes its value from the fields below it.
+#
+# Deadlines are compared within an admission cycle, so the year in the
+# report is dropped: August-December dates are placed in CYCLE_YEAR - 1
+# and January-July dates in CYCLE_YEAR. "November 30 of the preceding
+# year" then sorts before "March 1". Missing values are NaN / NaT.
+#
+#   python normalize.py colleges/ --max-gpa 3.0 --fall-deadline-after 03-01
+
+CYCLE_YEAR = 2000 # A leap year, so "February 29" has a place
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NAT = -2**63 # datetime64's NaT, as stored in the int64 fallback columns
+NAN = float("nan")
+
+GPA_KEYS = frozenset({"minimum gpa"})
+DEADLINE_KEY = re.compile(r"deadline")
+UNIT_CAP_KEYS = frozenset({"maximum transferable units", "max transferable units"})
+
+GPA_VALUE = re.compile(r"(?<![/\d.])([1-4]\.\d{1,2})(?![\d.])") # Not the "4.0" of "2.5/4.0"
+NO_MAXIMUM = re.compile(r"\bno (?:explicit |stated )?(?:maximum|limit)\b", re.IGNORECASE)
+UNIT_VALUE = re.compile(
+    r"(?<![\d.])(\d{1,3}(?:\.\d)?)\s*(semester|quarter)?\s*(?:\(\s*\d+\s*(?:semester|quarter)\s*\)\s*)?"
+    r"(?:transferable\s+|credit\s+)?(?:units?|hours?|credits?|points?)\b",
+    re.IGNORECASE
+)
+UNIT_FLOOR = re.compile(r"minimum|at least", re.IGNORECASE)
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+DATE_VALUE = re.compile(
+    r"\b(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|"
+    r"Sept?(?:ember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b"
+    r"(?:\s*[-–]\s*(\d{1,2})\b(?![,/]?\s*\d))?" # "November 1 - 30": the range ends on the 30th
+)
+TERM = re.compile(r"\b(fall|spring|summer|winter)\b", re.IGNORECASE)
+CLAUSE_BREAK = re.compile(r"[;\n]|\.\s")
+
+def normalize_key(key):
+    return re.sub(r"[^a-z0-9]+", " ", (key or "").lower()).strip()
+
+def is_extracted_key(key):
+    """True for a normalized key whose value feeds one of the columns."""
+    return key in GPA_KEYS or key in UNIT_CAP_KEYS or bool(DEADLINE_KEY.search(key))
+
+def general_fields(fields):
+    """
+    A general block's fields as (normalized key, value) pairs. A key with an
+    empty value gets the "key: value" lines of the fields after it, up to
+    the next empty or extracted key, since the parser reads those sub-keyed
+    lines as fields of their own.
+    """
+    result = []
+    for i, (key, value) in enumerate(fields):
+        if not value:
+            lines = []
+            for sub_key, sub_value in fields[i + 1:]:
+                if not sub_value or is_extracted_key(normalize_key(sub_key)):
+                    break
+                lines.append(f"{sub_key}: {sub_value}" if sub_key else sub_value)
+            value = "\n".join(lines)
+        result.append((normalize_key(key), value))
+    return result
+
+def cycle_day(month, day):
+    """Days since 1970-01-01 of `month`/`day` placed in the admission cycle (see above)."""
+    year = CYCLE_YEAR - 1 if month >= 8 else CYCLE_YEAR
+    try:
+        return date(year, month, day).toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        return NAT
+
+def extract_gpa(text):
+    """Lowest GPA on a 4-point scale mentioned in `text` ("2.5/4.0" counts as 2.5), or NaN."""
+    values = [float(value) for value in GPA_VALUE.findall(text or "")]
+    values = [value for value in values if value <= 4.0]
+    return min(values) if values else NAN
+
+def extract_unit_cap(text):
+    """First maximum transfer-credit figure in `text`, in semester units, or NaN."""
+    text = text or ""
+    if NO_MAXIMUM.search(text):
+        return NAN
+    for match in UNIT_VALUE.finditer(text):
+        if UNIT_FLOOR.search(text[max(0, match.start() - 20):match.start()]):
+            continue # "a minimum of 60 semester units" is an entry requirement, not a cap
+        units = float(match.group(1))
+        if (match.group(2) or "").lower() == "quarter":
+            units = units * 2 / 3
+        return units
+    return NAN
+
+def dates_in(text):
+    days = []
+    for match in DATE_VALUE.finditer(text):
+        day = int(match.group(3) or match.group(2))
+        days.append(cycle_day(MONTHS[match.group(1)[:3].lower()], day))
+    return [d for d in days if d != NAT]
+
+def extract_deadline(text, term):
+    """
+    Latest deadline for `term` ("fall" or "spring") mentioned in `text`, as
+    a cycle_day, or NAT. Dates count for a term when they follow a mention
+    of it (up to the next other term) or share a clause with it; text that
+    names no term at all is taken to be about fall admission.
+    """
+    text = text or ""
+    mentions = [(m.start(), m.end(), m.group(1).lower()) for m in TERM.finditer(text)]
+    if not mentions:
+        return max(dates_in(text), default=NAT) if term == "fall" else NAT
+
+    days = []
+    for i, (_, end, mentioned) in enumerate(mentions):
+        if mentioned != term:
+            continue
+        following = (start for start, _, other in mentions[i + 1:] if other != term)
+        days.extend(dates_in(text[end:next(following, len(text))]))
+    if not days:
+        # "November 1 - 30 (for Fall admission)"
+        for clause in CLAUSE_BREAK.split(text):
+            if any(m.group(1).lower() == term for m in TERM.finditer(clause)):
+                days.extend(dates_in(clause))
+    return max(days, default=NAT)
+
+class NormalizedTable:
+    """
+    One row per successful report. `names` and `domains` are lists; the
+    numeric columns are numpy arrays when numpy is installed, otherwise
+    array.array columns ('d' for floats, 'q' for days with NAT).
+    """
+
+    def __init__(self):
+        self.names = []
+        self.domains = []
+        self.min_gpa = array('d')
+        self.fall_deadline = array('q')
+        self.spring_deadline = array('q')
+        self.max_transfer_units = array('d')
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, university, general_info):
+        fields = {}
+        deadlines = []
+        for key, value in general_fields(general_info.fields if general_info else ()):
+            fields.setdefault(key, value)
+            if DEADLINE_KEY.search(key):
+                deadlines.append(f"{key}: {value}")
+        deadline_text = "\n".join(deadlines)
+
+        self.names.append(university.name)
+        self.domains.append(university.domain)
+        self.min_gpa.append(extract_gpa(next((fields[k] for k in GPA_KEYS if k in fields), "")))
+        self.fall_deadline.append(extract_deadline(deadline_text, "fall"))
+        self.spring_deadline.append(extract_deadline(deadline_text, "spring"))
+        self.max_transfer_units.append(
+            extract_unit_cap(next((fields[k] for k in UNIT_CAP_KEYS if k in fields), ""))
+        )
+
+    def freeze(self):
+        """Switch the numeric columns to numpy arrays (sharing memory) when numpy is available."""
+        if np is not None:
+            self.min_gpa = np.frombuffer(self.min_gpa, dtype=np.float64)
+            self.fall_deadline = np.frombuffer(self.fall_deadline, dtype="datetime64[D]")
+            self.spring_deadline = np.frombuffer(self.spring_deadline, dtype="datetime64[D]")
+            self.max_transfer_units = np.frombuffer(self.max_transfer_units, dtype=np.float64)
+        return self
+
+    def where(self, max_gpa=None, fall_deadline_after=None, spring_deadline_after=None, min_units=None):
+        """
+        Row mask for the given filters; deadlines are (month, day) pairs.
+        Rows missing a filtered value never match.
+        """
+        if np is not None:
+            mask = np.ones(len(self), dtype=bool)
+            if max_gpa is not None:
+                mask &= self.min_gpa <= max_gpa
+            if fall_deadline_after is not None:
+                mask &= self.fall_deadline > np.datetime64(cycle_day(*fall_deadline_after), "D")
+            if spring_deadline_after is not None:
+                mask &= self.spring_deadline > np.datetime64(cycle_day(*spring_deadline_after), "D")
+            if min_units is not None:
+                mask &= self.max_transfer_units >= min_units
+            return mask
+
+        tests = []
+        if max_gpa is not None:
+            tests.append((self.min_gpa, lambda v: v <= max_gpa))
+        if fall_deadline_after is not None:
+            fall_after = cycle_day(*fall_deadline_after)
+            tests.append((self.fall_deadline, lambda v: v != NAT and v > fall_after))
+        if spring_deadline_after is not None:
+            spring_after = cycle_day(*spring_deadline_after)
+            tests.append((self.spring_deadline, lambda v: v != NAT and v > spring_after))
+        if min_units is not None:
+            tests.append((self.max_transfer_units, lambda v: v >= min_units))
+        mask = [True] * len(self)
+        for column, test in tests:
+            mask = [keep and test(value) for keep, value in zip(mask, column)]
+        return mask
+
+    def rows(self, mask=None):
+        """Yield (name, domain, min_gpa, fall, spring, units) with deadlines as dates or None."""
+        for i, name in enumerate(self.names):
+            if mask is not None and not mask[i]:
+                continue
+            yield (name, self.domains[i], float(self.min_gpa[i]), day_to_date(self.fall_deadline[i]),
+                   day_to_date(self.spring_deadline[i]), float(self.max_transfer_units[i]))
+
+def day_to_date(value):
+    if np is not None and isinstance(value, np.datetime64):
+        value = value.astype("int64")
+    value = int(value)
+    return None if value == NAT else date.fromordinal(value + EPOCH_ORDINAL)
+
+def build_table(record_streams):
+    """NormalizedTable of the successful reports in an iterable of record iterators."""
+    table = NormalizedTable()
+    for records in record_streams:
+        university = general_info = None
+        for record in records:
+            if isinstance(record, University):
+                if university is not None and not university.failed:
+                    table.append(university, general_info)
+                university, general_info = record, None
+            elif isinstance(record, GeneralInfo) and general_info is None:
+                general_info = record
+        if university is not None and not university.failed:
+            table.append(university, general_info)
+    return table.freeze()
+
+def month_day(value):
+    try:
+        month, day = (int(part) for part in value.split("-"))
+        cycle_day(month, day)
+        date(CYCLE_YEAR, month, day)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected MM-DD, got {value!r}") from None
+    return month, day
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract GPA, deadline and unit-cap columns and filter on them.")
+    parser.add_argument("paths", nargs="*", help="Report files or directories of them")
+    parser.add_argument("--db", help=f"Read the reports from a storage.py database (e.g. {DEFAULT_DB_FILENAME})")
+    parser.add_argument("--max-gpa", type=float, help="Minimum GPA at most this")
+    parser.add_argument("--fall-deadline-after", type=month_day, metavar="MM-DD",
+                        help="Latest fall deadline after this date in the admission cycle")
+    parser.add_argument("--spring-deadline-after", type=month_day, metavar="MM-DD",
+                        help="Latest spring deadline after this date in the admission cycle")
+    parser.add_argument("--min-units", type=float, help="Transfer unit cap of at least this many semester units")
+    args = parser.parse_args()
+    if not args.paths and not args.db:
+        parser.error("give report paths and/or --db")
+
+    start = time.perf_counter()
+    streams = [read_report_records(path) for path in report_files(args.paths)]
+    if args.db:
+        store = ReportStore(args.db)
+        streams.extend(report_records(report) for report in store.reports())
+        store.close()
+    table = build_table(streams)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mask = table.where(args.max_gpa, args.fall_deadline_after, args.spring_deadline_after, args.min_units)
+    filtered = time.perf_counter() - start
+
+    print(f"{'University':<50} {'GPA':>5} {'Fall':>6} {'Spring':>6} {'Units':>6}")
+    matched = 0
+    for name, _, gpa, fall, spring, units in table.rows(mask):
+        matched += 1
+        print(f"{name[:50]:<50} {gpa:>5.2f} {fall.strftime('%b %d') if fall else '-':>6} "
+              f"{spring.strftime('%b %d') if spring else '-':>6} {units:>6.0f}")
+    print(f"{matched} of {len(table)} universities match "
+          f"(extracted in {built:.2f}s, filtered in {filtered * 1000:.2f} ms, "
+          f"{'numpy' if np is not None else 'array fallback'})")
@@ -0,0 +1,102 @@
+import re
+import threading
+
+# -----------------------------------------------------------------------------
+# Packing Several Universities Into One Request
+# -----------------------------------------------------------------------------
+#
+# A packed request asks for several reports at once. The model starts each
+# one with the usual delimiter and a NAME line:
+#
+#   --- UNIVERSITY_START ---
+#   NAME: Baylor University
+#   --- GENERAL_INFO_START ---
+#   ...
+#
+# split_packed_report() cuts the response back into one body per university.
+
+UNIVERSITY_DELIMITER = "--- UNIVERSITY_START ---"
+CHARS_PER_TOKEN = 4 # Rough size of a token in report text
+
+HEADER_LINE = re.compile(r"^\s*(NAME|DOMAIN|REPORT_DATE)\s*:\s*(.*?)\s*$")
+
+def normalize_name(name):
+    return re.sub(r"[^a-z0-9]+", " ", name.casefold()).strip()
+
+def split_packed_report(text, names):
+    """
+    Split a packed response on UNIVERSITY_DELIMITER and match each section
+    to one of `names` by its NAME line. Returns {name: body}, where body is
+    the section without the delimiter and header lines. Sections whose NAME
+    matches none of `names` are dropped; names without a section are absent.
+    """
+    wanted = {normalize_name(name): name for name in names}
+    reports = {}
+    # Anything before the first delimiter is preamble the model was told not to write
+    for section in text.split(UNIVERSITY_DELIMITER)[1:]:
+        lines = section.strip("\n").split("\n")
+        section_name = None
+        while lines and HEADER_LINE.match(lines[0]):
+            key, value = HEADER_LINE.match(lines.pop(0)).groups()
+            if key == "NAME":
+                section_name = value
+        name = wanted.get(normalize_name(section_name or ""))
+        if name is not None and name not in reports:
+            reports[name] = "\n".join(lines).strip("\n")
+    return reports
+
+class PackSizer:
+    """
+    Decides how many universities go into the next packed request so the
+    combined reports stay under the model's output-token limit.
+
+    A university's output is estimated from its own last report when one is
+    known, otherwise from a running average of the output tokens observed
+    per university. Packs are filled until the estimates reach `headroom`
+    of `output_limit`, up to `max_pack` universities. A truncated response
+    lowers `max_pack` so later packs are smaller.
+    """
+
+    def __init__(self, output_limit, max_pack, headroom=0.6, initial_estimate=8000):
+        self.output_limit = output_limit
+        self.max_pack = max_pack
+        self.headroom = headroom
+        self._average = float(initial_estimate)
+        self._known = {}
+        self._lock = threading.Lock()
+
+    def seed(self, name, report_size):
+        """Use the size in characters of an earlier report as this university's estimate."""
+        with self._lock:
+            self._known[name] = report_size / CHARS_PER_TOKEN
+
+    def estimate(self, name):
+        with self._lock:
+            return self._known.get(name, self._average)
+
+    def record(self, name, output_tokens):
+        """Record the output tokens one university's report actually took."""
+        with self._lock:
+            self._known[name] = output_tokens
+            self._average = 0.7 * self._average + 0.3 * output_tokens
+
+    def record_truncated(self, pack_size):
+        """A pack of `pack_size` ran out of output tokens; pack fewer from now on."""
+        with self._lock:
+            self.max_pack = max(1, min(self.max_pack, pack_size - 1))
+
+    def take(self, queue):
+        """
+        Pop the next pack off the front of `queue` (a deque of (name, domain)
+        pairs). Always returns at least one university if any are queued.
+        """
+        budget = self.output_limit * self.headroom
+        pack = []
+        used = 0.0
+        while queue and len(pack) < self.max_pack:
+            estimate = self.estimate(queue[0][0])
+            if pack and used + estimate > budget:
+                break
+            pack.append(queue.popleft())
+            used += estimate
+        return pack
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# Gemini Quota Rate Limiter
+# -----------------------------------------------------------------------------
+
+DAY_SECONDS = 24 * 60 * 60
+
+class DailyQuotaExceeded(Exception):
+    """Raised when the requests-per-day quota has been used up."""
+
+class RateLimiter:
+    """
+    Token-bucket limiter for the Gemini quotas: requests per minute (RPM),
+    tokens per minute (TPM) and requests per day (RPD).
+
+    Each call to `acquire` blocks until one request and an estimated number
+    of tokens are available, then reserves them. Once the response arrives,
+    `record_usage` reconciles the estimate with the real `usageMetadata`
+    count, so large responses slow down later requests instead of causing
+    429s. The limiter is thread-safe and meant to be shared by every worker.
+
+    The requests-per-day window outlives the process through `save` and
+    `load`, so rerunning the script does not start the daily count afresh.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, requests_per_day,
+                 initial_token_estimate=6000):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_day = requests_per_day
+
+        # Buckets start full so the first requests are admitted immediately
+        self._request_level = float(requests_per_minute)
+        self._token_level = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._day_window = deque()
+
+        # Running average of tokens per request, used for reservations
+        self._token_estimate = float(initial_token_estimate)
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_level = min(
+            self.requests_per_minute,
+            self._request_level + elapsed * self.requests_per_minute / 60.0
+        )
+        self._token_level = min(
+            self.tokens_per_minute,
+            self._token_level + elapsed * self.tokens_per_minute / 60.0
+        )
+        while self._day_window and now - self._day_window[0] >= DAY_SECONDS:
+            self._day_window.popleft()
+
+    def acquire(self, estimated_tokens=None, cancelled=None):
+        """
+        Block until the budget allows another request and reserve it.
+        Returns the number of tokens reserved, to be passed to `record_usage`,
+        or None without reserving anything once `cancelled()` returns True.
+        """
+        while True:
+            if cancelled is not None and cancelled():
+                return None
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if self.requests_per_day and len(self._day_window) >= self.requests_per_day:
+                    raise DailyQuotaExceeded(
+                        f"Daily quota of {self.requests_per_day} requests reached"
+                    )
+
+                tokens = self._token_estimate if estimated_tokens is None else estimated_tokens
+                # A single request can never need more than a full bucket
+                tokens = min(tokens, self.tokens_per_minute)
+
+                if self._request_level >= 1 and self._token_level >= tokens:
+                    self._request_level -= 1
+                    self._token_level -= tokens
+                    self._day_window.append(now)
+                    return tokens
+
+                wait_requests = (1 - self._request_level) * 60.0 / self.requests_per_minute
+                wait_tokens = (tokens - self._token_level) * 60.0 / self.tokens_per_minute
+                delay = max(wait_requests, wait_tokens, 0.01)
+                if cancelled is not None:
+                    delay = min(delay, 1.0)
+
+            time.sleep(delay)
+
+    def load(self, filepath):
+        """Restore the requests-per-day window saved by a previous run; a missing file is not an error."""
+        if not os.path.exists(filepath):
+            return
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                sent = json.load(f).get("requests_sent", [])
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️  Warning: Ignoring unreadable rate limit state {filepath}: {e}")
+            return
+        with self._lock:
+            # Saved as wall-clock times; the window itself runs on the monotonic clock
+            offset = time.monotonic() - time.time()
+            restored = sorted(t + offset for t in sent if isinstance(t, (int, float)))
+            self._day_window = deque(sorted(restored + list(self._day_window)))
+            self._refill(time.monotonic())
+
+    def save(self, filepath):
+        with self._lock:
+            self._refill(time.monotonic())
+            offset = time.time() - time.monotonic()
+            data = {"saved_at": time.time(), "requests_sent": [t + offset for t in self._day_window]}
+            tmp_path = filepath + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        os.replace(tmp_path, filepath)
+
+    def record_usage(self, reserved_tokens, actual_tokens):
+        """
+        Reconcile a reservation with the tokens the request actually used.
+        Passing `actual_tokens=None` (e.g. a failed request) refunds the
+        reservation without updating the running estimate.
+        """
+        with self._lock:
+            if actual_tokens is None:
+                self._token_level = min(self.tokens_per_minute,
+                                        self._token_level + reserved_tokens)
+                return
+            # Overshoot may take the bucket negative, delaying later requests
+            self._token_level = min(self.tokens_per_minute,
+                                    self._token_level + reserved_tokens - actual_tokens)
+            self._token_estimate = 0.8 * self._token_estimate + 0.2 * actual_tokens
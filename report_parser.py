@@ -0,0 +1,219 @@
+import re
+import sys
+
+# -----------------------------------------------------------------------------
+# Delimited Report Parser
+# -----------------------------------------------------------------------------
+#
+# Reads the text reports in COLLEGES_DIR back into records, one line at a
+# time. A report is a header followed by blocks:
+#
+#   --- UNIVERSITY_START ---
+#   NAME: Baylor University
+#   DOMAIN: www.baylor.edu
+#   REPORT_DATE: 2025-11-08 14:28:06
+#   --- GENERAL_INFO_START ---
+#   Minimum GPA: 2.75 minimum cumulative GPA ...
+#   --- GENERAL_INFO_START ---
+#   --- MAJOR_START ---
+#   Major Name: Biology
+#   ...
+#
+# The model sometimes repeats a start tag to close its block and sometimes
+# just starts the next one; both are accepted. Inside a block, "Key: value"
+# lines start a field and any other line continues the previous one.
+#
+# parse_lines() is a generator: it yields a University as soon as its header
+# is read, then a GeneralInfo and one Major per block as each block closes,
+# so memory use is bounded by the largest single block.
+
+UNIVERSITY_TAG = "--- UNIVERSITY_START ---"
+GENERAL_INFO_TAG = "--- GENERAL_INFO_START ---"
+MAJOR_TAG = "--- MAJOR_START ---"
+BLOCK_TAGS = (GENERAL_INFO_TAG, MAJOR_TAG)
+HEADER_KEYS = ("NAME", "DOMAIN", "REPORT_DATE", "STATUS")
+
+# Course codes such as "MTH 1321", "CS 61A", "ENGL 1A" or "MTH 1320/1321"
+COURSE_CODE = re.compile(
+    r"\b([A-Z]{2,5})[ -]?(\d{2,4}[A-Z]{0,2}|\d[A-Z]{1,2})\b((?:\s*/\s*(?:\d{2,4}[A-Z]{0,2}|\d[A-Z]{1,2})\b)*)"
+)
+# Capitalized words followed by a number that are not course subjects
+NOT_SUBJECTS = frozenset({
+    "FALL", "SPRING", "SUMMER", "WINTER", "GPA", "SAT", "ACT", "AP", "IB", "TOEFL", "IELTS", "PTE",
+    "CSU", "UC", "ADT", "TAG", "IGETC", "GE", "UNITS",
+})
+
+# "Key: value", "**Key:** value" or "**Key**: value"; bullets are never keys
+FIELD_LINE = re.compile(r"^(?:\*\*)?([A-Z][\w ,/()&'.+-]{0,80}?)(?::\*\*|\*\*:|:)[ \t]*(.*)$")
+
+class University:
+    __slots__ = ("name", "domain", "report_date", "status", "source")
+
+    def __init__(self, name=None, domain=None, report_date=None, status=None, source=None):
+        self.name = name
+        self.domain = domain
+        self.report_date = report_date
+        self.status = status
+        self.source = source
+
+    @property
+    def failed(self):
+        return self.status is not None and self.status.startswith("FAILED")
+
+    def __repr__(self):
+        return f"University({self.name!r}, {self.domain!r})"
+
+class _Block:
+    """A block of a report; `fields` is a tuple of (key, value) pairs."""
+    __slots__ = ("university", "fields")
+
+    def __init__(self, university, fields):
+        self.university = university
+        self.fields = fields
+
+    def get(self, key, default=None):
+        for field_key, value in self.fields:
+            if field_key == key:
+                return value
+        return default
+
+class GeneralInfo(_Block):
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"GeneralInfo({self.university.name!r}, {len(self.fields)} fields)"
+
+class Major(_Block):
+    """One MAJOR_START block; `name` comes from its "Major Name" field."""
+    __slots__ = ("name",)
+
+    def __init__(self, university, fields):
+        super().__init__(university, fields)
+        self.name = self.get("Major Name")
+
+    @property
+    def courses(self):
+        return self.get("Required Lower-Division Courses")
+
+    @property
+    def minimum_grade(self):
+        return self.get("Minimum Grade")
+
+    @property
+    def selectivity(self):
+        return self.get("Major Selectivity")
+
+    def __repr__(self):
+        return f"Major({self.university.name!r}, {self.name!r})"
+
+def course_codes(text):
+    """
+    Normalized course codes mentioned in `text` ("MTH 1321"), in order and
+    without duplicates. "MTH 1320/1321" yields both courses.
+    """
+    codes = []
+    for match in COURSE_CODE.finditer(text):
+        subject = match.group(1)
+        if subject in NOT_SUBJECTS:
+            continue
+        numbers = [match.group(2)] + re.findall(r"\w+", match.group(3))
+        for number in numbers:
+            code = f"{subject} {number}"
+            if code not in codes:
+                codes.append(code)
+    return codes
+
+def parse_fields(lines):
+    """Group block lines into a tuple of (key, value) fields."""
+    fields = []
+    key = None
+    value = []
+    for line in lines:
+        match = FIELD_LINE.match(line)
+        if match:
+            if key is not None or value:
+                fields.append((key, "\n".join(value).strip()))
+            # Keys repeat across thousands of reports; share one string each
+            key = sys.intern(match.group(1).strip())
+            value = [match.group(2)]
+        else:
+            value.append(line)
+    if key is not None or any(v.strip() for v in value):
+        fields.append((key, "\n".join(value).strip()))
+    return tuple(fields)
+
+def parse_lines(lines, source=None):
+    """
+    Parse report lines (e.g. an open file) and yield University, GeneralInfo
+    and Major records in order. Several reports may follow each other in
+    the same input.
+    """
+    university = None
+    in_header = False
+    block_tag = None     # tag of the block being read, if any
+    block_lines = []
+    pending_tag = None   # tag that just closed a block; content after it reopens one
+
+    def finish_block():
+        fields = parse_fields(block_lines)
+        if block_tag == GENERAL_INFO_TAG:
+            return GeneralInfo(university, fields)
+        return Major(university, fields)
+
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        stripped = line.strip()
+
+        if stripped == UNIVERSITY_TAG:
+            if block_tag is not None:
+                yield finish_block()
+            elif in_header:
+                yield university
+            university = University(source=source)
+            in_header = True
+            block_tag, block_lines, pending_tag = None, [], None
+            continue
+
+        if in_header:
+            key, sep, value = stripped.partition(":")
+            if sep and key in HEADER_KEYS:
+                setattr(university, "report_date" if key == "REPORT_DATE" else key.lower(), value.strip())
+                continue
+            in_header = False
+            yield university
+
+        if university is None:
+            continue
+
+        if stripped in BLOCK_TAGS:
+            if block_tag is not None:
+                yield finish_block()
+            if block_tag == stripped:
+                # Either a closing tag or the start of the next block of the same kind
+                block_tag, pending_tag = None, stripped
+            else:
+                block_tag, pending_tag = stripped, None
+            block_lines = []
+            continue
+
+        if block_tag is None:
+            if pending_tag is not None and stripped:
+                block_tag, pending_tag = pending_tag, None
+            else:
+                continue
+        block_lines.append(line)
+
+    if in_header:
+        yield university
+    elif block_tag is not None:
+        yield finish_block()
+
+def parse_file(file_path):
+    """Parse one report file, yielding its records."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from parse_lines(f, source=file_path)
+
+def parse_files(file_paths):
+    """Parse many report files in turn; only one is open at a time."""
+    for file_path in file_paths:
+        yield from parse_file(file_path)
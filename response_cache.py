@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# -----------------------------------------------------------------------------
+# On-Disk Response Cache
+# -----------------------------------------------------------------------------
+
+class ResponseCache:
+    """
+    Content-addressed cache of Gemini responses.
+
+    Entries are keyed on a SHA-256 of the API base URL, model, method and
+    serialized payload, so a stub server's answers never stand in for the
+    real API's, and stored one JSON file per entry. Entries older than
+    `ttl_seconds` are treated as misses and removed. When the directory grows
+    past `max_bytes`, the least recently used entries are evicted (a hit
+    refreshes the file's mtime, which is what recency is read from).
+    """
+
+    def __init__(self, directory, ttl_seconds, max_bytes):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> [size in bytes, last used time]
+        self._index = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                self._index[entry.name[:-len(".json")]] = [stat.st_size, stat.st_mtime]
+        self._total_bytes = sum(size for size, _ in self._index.values())
+
+    @staticmethod
+    def key_for(api_base, model, method, payload):
+        serialized = json.dumps({"api_base": api_base, "model": model, "method": method, "payload": payload},
+                                sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remove(self, key):
+        size, _ = self._index.pop(key, (0, 0))
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        """Return (response, time it was cached) for `key`, or None on a miss."""
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+
+            now = time.time()
+            if now - entry.get("created", 0) > self.ttl_seconds:
+                self._remove(key)
+                return None
+
+            self._index[key][1] = now
+            os.utime(self._path(key), (now, now))
+            return entry["response"], entry["created"]
+
+    def put(self, key, response):
+        data = json.dumps({"created": time.time(), "response": response}).encode("utf-8")
+        with self._lock:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+
+            old_size, _ = self._index.get(key, (0, 0))
+            self._index[key] = [len(data), time.time()]
+            self._total_bytes += len(data) - old_size
+
+            # Evict least recently used entries until back under the limit
+            if self._total_bytes > self.max_bytes:
+                for old_key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+                    if self._total_bytes <= self.max_bytes or old_key == key:
+                        break
+                    self._remove(old_key)
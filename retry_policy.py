@@ -0,0 +1,143 @@
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# -----------------------------------------------------------------------------
+# Retry Policy
+# -----------------------------------------------------------------------------
+
+RETRYABLE_STATUS = {
+    408: "timeout",
+    429: "rate_limited",
+    500: "server_error",
+    502: "server_error",
+    503: "server_error",
+    504: "server_error",
+}
+
+# Longest server-requested wait we are willing to honor
+MAX_RETRY_AFTER_SECONDS = 300
+
+def classify_error(error):
+    """
+    Return the failure class of a retryable error ('timeout', 'rate_limited',
+    'server_error' or 'connection'), or None if retrying cannot help.
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return RETRYABLE_STATUS.get(status)
+    if isinstance(error, (requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError)):
+        return "connection"
+    return None
+
+def retry_after_seconds(error):
+    """
+    Seconds the server asked us to wait, from a Retry-After header (seconds
+    or HTTP date) or a google.rpc.RetryInfo detail in the error body.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    header = response.headers.get("Retry-After")
+    if header:
+        if header.strip().isdigit():
+            return float(header)
+        try:
+            when = parsedate_to_datetime(header)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+
+    try:
+        details = response.json().get("error", {}).get("details", [])
+    except ValueError:
+        return None
+    for detail in details:
+        if detail.get("@type", "").endswith("google.rpc.RetryInfo"):
+            match = re.match(r"([\d.]+)s$", detail.get("retryDelay", ""))
+            if match:
+                return float(match.group(1))
+    return None
+
+class RetryPolicy:
+    """
+    Retries transient Gemini errors with decorrelated jitter.
+
+    Errors are classified first: 400/401/403/404 and other fatal errors are
+    raised immediately, while timeouts, connection errors, 429 and 5xx are
+    retried. A 429/503 with Retry-After (or RetryInfo) waits at least that
+    long. Retries across the whole run come out of a shared budget of
+    `min_retries + budget_ratio * attempts`, so a provider outage cannot
+    multiply the load by `max_attempts`. `on_retry()`, if given, is called
+    for each retry actually made, from the thread that makes it.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=60.0,
+                 budget_ratio=0.2, min_retries=10, on_retry=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_retries = min_retries
+        self.on_retry = on_retry
+        self._attempts = 0
+        self._retries = 0
+        self._lock = threading.Lock()
+
+    def _record_attempt(self):
+        with self._lock:
+            self._attempts += 1
+
+    def _try_spend_retry(self):
+        with self._lock:
+            allowed = self.min_retries + self.budget_ratio * self._attempts
+            if self._retries + 1 > allowed:
+                return False
+            self._retries += 1
+            return True
+
+    def next_delay(self, previous_delay):
+        """Decorrelated jitter: uniform between the base and 3x the last delay, capped."""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+
+    def call(self, attempt_fn, label):
+        """
+        Run `attempt_fn` until it succeeds, fails fatally, runs out of attempts
+        or the run's retry budget is spent; the last error is re-raised.
+        """
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            self._record_attempt()
+            try:
+                return attempt_fn()
+            except Exception as e:
+                failure_class = classify_error(e)
+                if failure_class is None:
+                    if isinstance(e, requests.exceptions.RequestException):
+                        print(f"Failed to generate data for {label} (not retryable). Error: {e}")
+                    raise
+                if attempt == self.max_attempts:
+                    print(f"Failed to generate data for {label} after {attempt} attempts. Error: {e}")
+                    raise
+                if not self._try_spend_retry():
+                    print(f"Retry budget exhausted; giving up on {label}. Error: {e}")
+                    raise
+                if self.on_retry is not None:
+                    self.on_retry()
+
+                delay = self.next_delay(delay)
+                requested = retry_after_seconds(e)
+                if requested is not None:
+                    delay = max(delay, min(requested, MAX_RETRY_AFTER_SECONDS))
+                print(f"Request failed for {label} ({failure_class}, attempt {attempt}/{self.max_attempts}). "
+                      f"Retrying in {delay:.1f}s...")
+                time.sleep(delay)
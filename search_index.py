@@ -0,0 +1,231 @@
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from checkpoint import parse_report_header
+from report_parser import COURSE_CODE, NOT_SUBJECTS, course_codes
+
+# -----------------------------------------------------------------------------
+# Full-Text Search Index
+# -----------------------------------------------------------------------------
+#
+# An inverted index over the reports, kept in a small SQLite database:
+#
+#   documents  one row per university: where its report came from
+#   terms      every distinct term, with an integer id
+#   postings   (term, document, count), clustered by term, so a term's
+#              postings list is one contiguous range of the table
+#
+# Course codes are single terms ("ENG 1310", "MTH 1320/1321" gives both
+# courses), so searching for one does not match every ENG and every 1310.
+# Everything else is indexed as lowercase words ("igetc").
+#
+#   python search_index.py update colleges/       (only new or changed files)
+#   python search_index.py query "ENG 1310" IGETC
+#
+# main.py --search-index keeps the index current as reports are saved.
+
+DEFAULT_INDEX_FILENAME = "search.db"
+
+WORD = re.compile(r"[a-z0-9](?:[a-z0-9+#&'-]*[a-z0-9+#])?") # Applied to lowercased text
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "that", "the", "this", "to", "with",
+})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    source TEXT,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS documents_source ON documents (source);
+
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (term_id, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_document ON postings (document_id);
+"""
+
+def tokenize(text):
+    """Course codes ("MTH 1321") and lowercase words of `text`, stop words dropped."""
+    terms = course_codes(text)
+    terms.extend(word for word in WORD.findall(text.lower()) if word not in STOP_WORDS)
+    return terms
+
+def query_terms(query):
+    """Terms of a query; a course code is searched as itself, not also as its words."""
+    words = COURSE_CODE.sub(lambda m: m.group(0) if m.group(1) in NOT_SUBJECTS else " ", query)
+    return sorted(set(course_codes(query) + tokenize(words)))
+
+class SearchIndex:
+    """
+    Thread-safe inverted index at `path`. Like storage.ReportStore, writes
+    are grouped into transactions of up to `batch_size` documents.
+    """
+
+    def __init__(self, path, batch_size=200):
+        self.path = path
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+        self._term_ids = dict(
+            (term, term_id) for term_id, term in self._connection.execute("SELECT id, term FROM terms")
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _term_id(self, term):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._connection.execute("INSERT INTO terms (term) VALUES (?)", (term,)).lastrowid
+            self._term_ids[term] = term_id
+        return term_id
+
+    def add(self, name, text, source=None, mtime_ns=None, size=None):
+        """Index (or re-index) `name`'s report."""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            db = self._connection
+            if not db.in_transaction:
+                db.execute("BEGIN")
+            db.execute("DELETE FROM documents WHERE name = ?", (name,))
+            document_id = db.execute(
+                "INSERT INTO documents (name, source, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                (name, source, mtime_ns, size)
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO postings (term_id, document_id, count) VALUES (?, ?, ?)",
+                [(self._term_id(term), document_id, count) for term, count in counts.items()]
+            )
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                db.execute("COMMIT")
+                self._pending = 0
+
+    def update_files(self, paths):
+        """
+        Index the report files in `paths` that are new or changed since they
+        were last indexed, and drop documents whose file is gone from a
+        directory being scanned. Returns (indexed, unchanged, removed).
+        """
+        with self._lock:
+            known = {
+                source: (mtime_ns, size) for source, mtime_ns, size in
+                self._connection.execute("SELECT source, mtime_ns, size FROM documents WHERE source IS NOT NULL")
+            }
+        indexed = unchanged = 0
+        seen = set()
+        for file_path in paths:
+            seen.add(file_path)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            if known.get(file_path) == (stat.st_mtime_ns, stat.st_size):
+                unchanged += 1
+                continue
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            header = parse_report_header(text)
+            name = (header or {}).get("NAME") or os.path.splitext(os.path.basename(file_path))[0]
+            self.add(name, text, file_path, stat.st_mtime_ns, stat.st_size)
+            indexed += 1
+
+        directories = {os.path.dirname(path) for path in seen}
+        gone = [source for source in known if source not in seen and os.path.dirname(source) in directories]
+        with self._lock:
+            self._connection.executemany("DELETE FROM documents WHERE source = ?", [(s,) for s in gone])
+        self.flush()
+        return indexed, unchanged, len(gone)
+
+    def search(self, query, limit=None):
+        """
+        Universities whose report contains every term of `query`, as
+        (name, matches) pairs, most matches first.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            term_ids = [self._term_ids.get(term) for term in terms]
+            if None in term_ids:
+                return []
+            placeholders = ", ".join("?" * len(term_ids))
+            return self._connection.execute(
+                f"SELECT d.name, SUM(p.count) AS matches FROM postings p "
+                f"JOIN documents d ON d.id = p.document_id "
+                f"WHERE p.term_id IN ({placeholders}) "
+                f"GROUP BY p.document_id HAVING COUNT(*) = ? "
+                f"ORDER BY matches DESC, d.name LIMIT ?",
+                (*term_ids, len(term_ids), -1 if limit is None else limit)
+            ).fetchall()
+
+    def document_count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def flush(self):
+        with self._lock:
+            if self._connection.in_transaction:
+                self._connection.execute("COMMIT")
+                self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+def report_files(paths):
+    """Report files named by `paths`, expanding directories to their .txt and .json files."""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "*.txt")) + glob.glob(os.path.join(path, "*.json")))
+        else:
+            yield path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the full-text index of the reports.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_FILENAME,
+                        help=f"Index database file (default: {DEFAULT_INDEX_FILENAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="Index new and changed report files")
+    update.add_argument("paths", nargs="+", help="Report files or directories of them")
+    query = commands.add_parser("query", help="List the universities whose reports contain every term")
+    query.add_argument("terms", nargs="+", help='Words or course codes, e.g. "ENG 1310" IGETC')
+    query.add_argument("--limit", type=int, default=20, help="Most results to show (default: 20)")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    if args.command == "update":
+        start = time.perf_counter()
+        indexed, unchanged, removed = index.update_files(report_files(args.paths))
+        print(f"✅ Indexed {indexed} reports ({unchanged} unchanged, {removed} removed) "
+              f"in {time.perf_counter() - start:.1f}s; {index.document_count()} in {args.index}")
+    else:
+        # Quote-free course codes on the command line arrive as separate words
+        text = " ".join(args.terms)
+        start = time.perf_counter()
+        results = index.search(text, args.limit)
+        elapsed = time.perf_counter() - start
+        for name, matches in results:
+            print(f"{matches:>5}  {name}")
+        print(f"{len(results)} results for {text!r} in {elapsed * 1000:.1f} ms")
+    index.close()
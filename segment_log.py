@@ -0,0 +1,321 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import threading
+
+from checkpoint import parse_report_header
+
+# -----------------------------------------------------------------------------
+# Append-Only Segment Log
+# -----------------------------------------------------------------------------
+#
+# Instead of one file per university, reports are appended to a few large
+# segment files in SEGMENT_LOG_DIR:
+#
+#   segment-000001.log   records: `<length> "<name>"\n<report bytes>\n`
+#   segment-000002.log   started once the previous one reaches segment_bytes
+#   index.log            one line per record: `<segment> <offset> <length> "<name>"`
+#
+# Writing a report is two appends to files that stay open. Overwriting a
+# report appends a new version, so earlier versions stay readable (history)
+# until compact() rewrites the log with only the latest ones. Reads slice
+# an mmap of the segment, so a report is never copied until it is decoded.
+#
+#   python segment_log.py get "Baylor University"
+#   python segment_log.py history "Baylor University"
+#   python segment_log.py compact
+#   python segment_log.py export colleges/
+
+DEFAULT_LOG_DIR = "report_log"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+INDEX_FILENAME = "index.log"
+SEGMENT_FILENAME = re.compile(r"^segment-(\d{6})\.log$")
+
+def segment_filename(number):
+    return f"segment-{number:06d}.log"
+
+class SegmentLog:
+    """
+    Thread-safe append-only store of reports, keyed by university name.
+    Each name maps to a list of (segment, offset, length) versions,
+    oldest first.
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES):
+        self.path = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._maps = {} # segment -> (mapped size, mmap)
+        self._load()
+        self._open_for_append()
+
+    # -- Opening and recovery -------------------------------------------------
+
+    def _segments(self):
+        numbers = []
+        for entry in os.listdir(self.path):
+            match = SEGMENT_FILENAME.match(entry)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, segment_filename(number))
+
+    def _load(self):
+        """Read index.log, then pick up any records a crash left out of it."""
+        index_path = os.path.join(self.path, INDEX_FILENAME)
+        indexed_end = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        segment, offset, length, name = line.rstrip("\n").split(" ", 3)
+                        entry = (int(segment), int(offset), int(length))
+                        name = json.loads(name)
+                    except ValueError:
+                        break # A torn last line
+                    self._versions.setdefault(name, []).append(entry)
+                    indexed_end[entry[0]] = max(indexed_end.get(entry[0], 0), entry[1] + entry[2] + 1)
+
+        # Segments written after the last index line; the scan also drops a torn last record
+        missing = []
+        for segment in self._segments():
+            if segment >= max(indexed_end, default=0):
+                missing.extend(self._scan(segment, indexed_end.get(segment, 0)))
+        if missing:
+            with open(index_path, 'a', encoding='utf-8') as f:
+                for name, entry in missing:
+                    self._versions.setdefault(name, []).append(entry)
+                    f.write(self._index_line(name, entry))
+
+    def _scan(self, segment, start):
+        """Records of `segment` from byte `start` on, as (name, entry) pairs."""
+        records = []
+        path = self._segment_path(segment)
+        with open(path, 'rb') as f:
+            f.seek(start)
+            position = start
+            while True:
+                line = f.readline()
+                try:
+                    length, name = line.decode('utf-8').rstrip("\n").split(" ", 1)
+                    length, name = int(length), json.loads(name)
+                except ValueError:
+                    break
+                offset = position + len(line)
+                f.seek(offset + length)
+                if f.read(1) != b"\n":
+                    break
+                records.append((name, (segment, offset, length)))
+                position = offset + length + 1
+        if os.path.getsize(path) > position:
+            with open(path, 'r+b') as f:
+                f.truncate(position)
+        return records
+
+    def _open_for_append(self):
+        segments = self._segments()
+        self._segment = segments[-1] if segments else 1
+        self._data = open(self._segment_path(self._segment), 'ab')
+        self._index = open(os.path.join(self.path, INDEX_FILENAME), 'a', encoding='utf-8')
+
+    @staticmethod
+    def _index_line(name, entry):
+        return f"{entry[0]} {entry[1]} {entry[2]} {json.dumps(name, ensure_ascii=False)}\n"
+
+    # -- Writing ----------------------------------------------------------------
+
+    def append(self, name, data_block):
+        """Append a new version of `name`'s report."""
+        payload = data_block.encode('utf-8')
+        record_header = f"{len(payload)} {json.dumps(name, ensure_ascii=False)}\n".encode('utf-8')
+        with self._lock:
+            if self._data.tell() and self._data.tell() + len(record_header) + len(payload) > self.segment_bytes:
+                self._data.close()
+                self._segment += 1
+                self._data = open(self._segment_path(self._segment), 'ab')
+            offset = self._data.tell() + len(record_header)
+            self._data.write(record_header + payload + b"\n")
+            self._data.flush()
+            entry = (self._segment, offset, len(payload))
+            # The index line goes out after its record, so it never points past the data
+            self._index.write(self._index_line(name, entry))
+            self._index.flush()
+            self._versions.setdefault(name, []).append(entry)
+
+    def flush(self):
+        with self._lock:
+            self._data.flush()
+            os.fsync(self._data.fileno())
+            self._index.flush()
+            os.fsync(self._index.fileno())
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._data.close()
+            self._index.close()
+            self._release_maps()
+
+    # -- Reading ----------------------------------------------------------------
+
+    def _view(self, entry):
+        segment, offset, length = entry
+        mapped = self._maps.get(segment)
+        if mapped is None or mapped[0] < offset + length:
+            # The active segment has grown since it was mapped
+            with open(self._segment_path(segment), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                mapped = (size, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ))
+            self._maps[segment] = mapped
+        return memoryview(mapped[1])[offset:offset + length]
+
+    def _release_maps(self):
+        for _, mapped in self._maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                pass # Still viewed by a caller; freed with its last memoryview
+        self._maps = {}
+
+    def names(self):
+        with self._lock:
+            return sorted(self._versions)
+
+    def view(self, name, version=-1):
+        """
+        A read-only memoryview of one version of a report's UTF-8 bytes
+        (default the latest), or None if there is no such report.
+        """
+        with self._lock:
+            versions = self._versions.get(name)
+            if not versions:
+                return None
+            try:
+                return self._view(versions[version])
+            except IndexError:
+                return None
+
+    def read(self, name, version=-1):
+        view = self.view(name, version)
+        return None if view is None else str(view, 'utf-8')
+
+    def history(self, name):
+        """Every stored version of a report, oldest first."""
+        with self._lock:
+            count = len(self._versions.get(name, ()))
+        return [self.read(name, version) for version in range(count)]
+
+    def header(self, name):
+        """Header fields of a university's latest report, like checkpoint.read_report_header."""
+        view = self.view(name)
+        return None if view is None else parse_report_header(str(view, 'utf-8'))
+
+    def report_size(self, name):
+        with self._lock:
+            versions = self._versions.get(name)
+            return versions[-1][2] if versions else None
+
+    # -- Maintenance --------------------------------------------------------------
+
+    def compact(self):
+        """
+        Rewrite the log with only the latest version of each report, then
+        delete the old segments. Returns the number of bytes reclaimed.
+        """
+        with self._lock:
+            self._data.close()
+            self._index.close()
+            old_segments = self._segments()
+            before = sum(os.path.getsize(self._segment_path(s)) for s in old_segments)
+
+            segment = old_segments[-1] + 1 if old_segments else 1
+            data = open(self._segment_path(segment), 'wb')
+            versions = {}
+            index_lines = []
+            for name in sorted(self._versions):
+                payload = self._view(self._versions[name][-1])
+                record_header = f"{len(payload)} {json.dumps(name, ensure_ascii=False)}\n".encode('utf-8')
+                if data.tell() and data.tell() + len(record_header) + len(payload) > self.segment_bytes:
+                    data.close()
+                    segment += 1
+                    data = open(self._segment_path(segment), 'wb')
+                entry = (segment, data.tell() + len(record_header), len(payload))
+                data.write(record_header)
+                data.write(payload)
+                data.write(b"\n")
+                payload.release()
+                versions[name] = [entry]
+                index_lines.append(self._index_line(name, entry))
+            data.flush()
+            os.fsync(data.fileno())
+            data.close()
+
+            index_path = os.path.join(self.path, INDEX_FILENAME)
+            with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+                f.writelines(index_lines)
+                f.flush()
+                os.fsync(f.fileno())
+            # The new index takes effect atomically; old segments are unreferenced after this
+            os.replace(index_path + ".tmp", index_path)
+
+            self._release_maps()
+            for old in old_segments:
+                os.remove(self._segment_path(old))
+            self._versions = versions
+            self._open_for_append()
+            after = sum(os.path.getsize(self._segment_path(s)) for s in self._segments())
+        return before - after
+
+    def export(self, directory, filename_for):
+        """Write the latest version of every report out as a file; `filename_for(name, report)` names it."""
+        os.makedirs(directory, exist_ok=True)
+        names = self.names()
+        for name in names:
+            report = self.read(name)
+            with open(os.path.join(directory, filename_for(name, report)), 'w', encoding='utf-8') as f:
+                f.write(report)
+        return len(names)
+
+if __name__ == "__main__":
+    from storage import export_filename
+
+    parser = argparse.ArgumentParser(description="Read, compact and export the report segment log.")
+    parser.add_argument("--dir", default=DEFAULT_LOG_DIR,
+                        help=f"Segment log directory (default: {DEFAULT_LOG_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    get = commands.add_parser("get", help="Print a university's latest report")
+    get.add_argument("name")
+    history = commands.add_parser("history", help="Print every stored version of a university's report")
+    history.add_argument("name")
+    commands.add_parser("compact", help="Drop all but the latest version of each report")
+    dump = commands.add_parser("export", help="Write the latest version of every report out as a file")
+    dump.add_argument("directory")
+    args = parser.parse_args()
+
+    log = SegmentLog(args.dir)
+    if args.command == "get":
+        report = log.read(args.name)
+        if report is None:
+            print(f"No report for {args.name} in {args.dir}/")
+        else:
+            print(report, end="")
+    elif args.command == "history":
+        reports = log.history(args.name)
+        for version, report in enumerate(reports, 1):
+            print(f"=== Version {version} of {len(reports)} ===")
+            print(report, end="")
+        if not reports:
+            print(f"No report for {args.name} in {args.dir}/")
+    elif args.command == "compact":
+        reclaimed = log.compact()
+        print(f"✅ Compacted {args.dir}/: {len(log.names())} reports, {reclaimed / 1024:.0f} KiB reclaimed")
+    else:
+        count = log.export(args.directory, export_filename)
+        print(f"✅ Exported {count} reports to {args.directory}/")
+    log.close()
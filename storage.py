@@ -0,0 +1,309 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from report_parser import GeneralInfo, Major, University, course_codes, parse_lines
+
+# -----------------------------------------------------------------------------
+# SQLite Report Store
+# -----------------------------------------------------------------------------
+#
+# Every report is written to one SQLite database:
+#
+#   universities  one row per university: header fields and the report as saved
+#   general_info  the general block's fields, in order
+#   majors        one row per major block
+#   courses       course codes mentioned by each major ("MTH 1321")
+#
+# so questions across universities are index lookups instead of scans over
+# COLLEGES_DIR. Writes are grouped into transactions of up to `batch_size`
+# reports; a save made `commit_interval` seconds or more after the last
+# commit is committed at once, so slow runs never leave a report uncommitted.
+# close() commits the rest.
+#
+#   python storage.py import colleges/*.txt
+#   python storage.py course "MTH 1321"
+#   python storage.py export colleges/
+
+DEFAULT_DB_FILENAME = "reports.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS universities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    domain TEXT,
+    report_date TEXT,
+    status TEXT,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS universities_domain ON universities (domain);
+
+CREATE TABLE IF NOT EXISTS general_info (
+    university_id INTEGER NOT NULL REFERENCES universities (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    key TEXT,
+    value TEXT,
+    PRIMARY KEY (university_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS majors (
+    id INTEGER PRIMARY KEY,
+    university_id INTEGER NOT NULL REFERENCES universities (id) ON DELETE CASCADE,
+    name TEXT,
+    selectivity TEXT,
+    minimum_grade TEXT,
+    courses TEXT
+);
+CREATE INDEX IF NOT EXISTS majors_university ON majors (university_id);
+CREATE INDEX IF NOT EXISTS majors_name ON majors (name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS courses (
+    code TEXT NOT NULL,
+    major_id INTEGER NOT NULL REFERENCES majors (id) ON DELETE CASCADE,
+    PRIMARY KEY (code, major_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS courses_major ON courses (major_id);
+"""
+
+def records_from_json(data_block):
+    """University, GeneralInfo and Major records for a JSON report (see json_report.py)."""
+    report = json.loads(data_block)
+    university = University(report.get("name"), report.get("domain"), report.get("report_date"),
+                            report.get("status"))
+    yield university
+    if "general_info" in report:
+        yield GeneralInfo(university, tuple(report["general_info"].items()))
+    for major in report.get("majors", []):
+        fields = (
+            ("Major Name", major.get("name")),
+            ("Required Lower-Division Courses", "\n".join(major.get("courses", []))),
+            ("Minimum Grade", major.get("minimum_grade")),
+            ("Major Selectivity", major.get("selectivity")),
+            ("Notes", major.get("notes")),
+        )
+        yield Major(university, tuple(field for field in fields if field[1]))
+
+def report_records(data_block):
+    """Parse a report as main.py saves it, delimited text or a JSON record."""
+    if data_block.lstrip().startswith("{"):
+        return records_from_json(data_block)
+    return parse_lines(data_block.splitlines())
+
+def read_report_records(file_path):
+    """Like report_parser.parse_file, for a report file of either kind (.txt or .json)."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data_block = f.read()
+    if data_block.lstrip().startswith("{"):
+        yield from records_from_json(data_block)
+    else:
+        yield from parse_lines(data_block.splitlines(), source=file_path)
+
+class ReportStore:
+    """
+    Thread-safe writer and reader for the report database at `path`.
+    `save` accepts a report exactly as main.py writes it to a file, either
+    delimited text or a JSON record; a university's previous report is
+    replaced.
+    """
+
+    def __init__(self, path, batch_size=50, commit_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _begin(self):
+        if not self._connection.in_transaction:
+            self._connection.execute("BEGIN")
+
+    def _commit(self):
+        self._connection.execute("COMMIT")
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def _maybe_commit(self):
+        self._pending += 1
+        if (self._pending >= self.batch_size
+                or time.monotonic() - self._last_commit >= self.commit_interval):
+            self._commit()
+
+    def save(self, data_block):
+        """Store one report. Returns the university's name, or None if the report had no header."""
+        records = report_records(data_block)
+
+        with self._lock:
+            self._begin()
+            # A report that fails half way is rolled back without losing the rest of the batch
+            self._connection.execute("SAVEPOINT report")
+            try:
+                name = self._insert(records, data_block)
+            except Exception:
+                self._connection.execute("ROLLBACK TO report")
+                raise
+            finally:
+                self._connection.execute("RELEASE report")
+            self._maybe_commit()
+        return name
+
+    def _insert(self, records, data_block):
+        db = self._connection
+        university_id = None
+        name = None
+        position = 0
+        for record in records:
+            if isinstance(record, University):
+                if university_id is not None:
+                    break # One report per call; packed output is split before saving
+                name = record.name
+                db.execute("DELETE FROM universities WHERE name = ?", (name,))
+                university_id = db.execute(
+                    "INSERT INTO universities (name, domain, report_date, status, report) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (name, record.domain, record.report_date, record.status, data_block)
+                ).lastrowid
+            elif isinstance(record, GeneralInfo):
+                db.executemany(
+                    "INSERT INTO general_info (university_id, position, key, value) VALUES (?, ?, ?, ?)",
+                    [(university_id, position + i, key, value) for i, (key, value) in enumerate(record.fields)]
+                )
+                position += len(record.fields)
+            else:
+                major_id = db.execute(
+                    "INSERT INTO majors (university_id, name, selectivity, minimum_grade, courses) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (university_id, record.name, record.selectivity, record.minimum_grade, record.courses)
+                ).lastrowid
+                text = "\n".join(value for _, value in record.fields if value)
+                db.executemany(
+                    "INSERT INTO courses (code, major_id) VALUES (?, ?)",
+                    [(code, major_id) for code in course_codes(text)]
+                )
+        return name
+
+    def flush(self):
+        with self._lock:
+            if self._connection.in_transaction:
+                self._commit()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def header(self, name):
+        """Header fields of a university's report, like checkpoint.read_report_header."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT name, domain, report_date, status FROM universities WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {key: value for key, value in zip(("NAME", "DOMAIN", "REPORT_DATE", "STATUS"), row)
+                if value is not None}
+
+    def headers(self):
+        """Header fields of every stored report."""
+        with self._lock:
+            names = [row[0] for row in self._connection.execute("SELECT name FROM universities ORDER BY name")]
+        return [self.header(name) for name in names]
+
+    def report_size(self, name):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT length(report) FROM universities WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def report(self, name):
+        """A university's report as saved, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT report FROM universities WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def reports(self):
+        """Every stored report, in name order."""
+        with self._lock:
+            rows = self._connection.execute("SELECT report FROM universities ORDER BY name").fetchall()
+        return [report for report, in rows]
+
+    def majors_requiring(self, code):
+        """(university, major) pairs whose requirements mention a course code such as "MTH 1321"."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT u.name, m.name FROM courses c "
+                "JOIN majors m ON m.id = c.major_id "
+                "JOIN universities u ON u.id = m.university_id "
+                "WHERE c.code = ? ORDER BY u.name, m.name",
+                (" ".join(code.upper().split()),)
+            ).fetchall()
+
+    def export(self, directory, filename_for):
+        """Write every stored report back out as a file; `filename_for(name, report)` names it."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            rows = self._connection.execute("SELECT name, report FROM universities ORDER BY name").fetchall()
+        for name, report in rows:
+            with open(os.path.join(directory, filename_for(name, report)), 'w', encoding='utf-8') as f:
+                f.write(report)
+        return len(rows)
+
+def sanitize_filename(filename):
+    """Convert a string into a safe filename."""
+    # Replace invalid filename characters with underscores
+    invalid_chars = '<>:"/\\|?*'
+    for char in invalid_chars:
+        filename = filename.replace(char, '_')
+    return filename.strip()
+
+def export_filename(name, report):
+    """The filename main.py would have used for this report."""
+    extension = ".json" if report.lstrip().startswith("{") else ".txt"
+    return sanitize_filename(name) + extension
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load, query and export the report database.")
+    parser.add_argument("--db", default=DEFAULT_DB_FILENAME,
+                        help=f"SQLite database file (default: {DEFAULT_DB_FILENAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="Load report files (.txt or .json) into the database")
+    load.add_argument("paths", nargs="+", help="Report files or directories of them")
+    course = commands.add_parser("course", help="List the majors whose requirements mention a course")
+    course.add_argument("code", help='Course code, e.g. "MTH 1321"')
+    dump = commands.add_parser("export", help="Write every stored report back out as a file")
+    dump.add_argument("directory")
+    args = parser.parse_args()
+
+    store = ReportStore(args.db, batch_size=500)
+    if args.command == "import":
+        loaded = 0
+        for path in args.paths:
+            files = (sorted(glob.glob(os.path.join(path, "*.txt")) + glob.glob(os.path.join(path, "*.json")))
+                     if os.path.isdir(path) else [path])
+            for file_path in files:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    if store.save(f.read()):
+                        loaded += 1
+                    else:
+                        print(f"⚠️  Warning: {file_path} has no report header; skipped.")
+        print(f"✅ Loaded {loaded} reports into {args.db}")
+    elif args.command == "course":
+        rows = store.majors_requiring(args.code)
+        for university, major in rows:
+            print(f"{university}: {major}")
+        print(f"{len(rows)} majors mention {args.code}")
+    else:
+        count = store.export(args.directory, export_filename)
+        print(f"✅ Exported {count} reports to {args.directory}/")
+    store.close()
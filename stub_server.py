@@ -0,0 +1,463 @@
+import argparse
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -----------------------------------------------------------------------------
+# Local Stand-in for the Gemini REST API
+# -----------------------------------------------------------------------------
+#
+# Serves just enough of the generativelanguage.googleapis.com surface for
+# main.py to run offline, e.g. for benchmarks:
+#
+#   python stub_server.py --port 8765 --latency 0.2
+#   GEMINI_API_KEY=test python main.py --api-base http://127.0.0.1:8765/v1beta
+
+QUERY_PATTERN = re.compile(r"prerequisites for (?P<name>.+?) using the search domain (?P<domain>\S+?)\.?\s")
+# One line per university in a packed request (main.py --pack)
+PACKED_QUERY_PATTERN = re.compile(r"^\s*- (?P<name>.+?) \(search domain: (?P<domain>\S+)\)\s*$", re.MULTILINE)
+
+# Fan-out requests (main.py --fan-out): the overview and the per-major calls
+OVERVIEW_QUERY_PATTERN = re.compile(r"list of transfer majors for (?P<name>.+?) using the search domain (?P<domain>\S+?)\.?\s")
+MAJOR_QUERY_PATTERN = re.compile(
+    r"requirements for the major (?P<major>.+) at (?P<name>.+?) using the search domain (?P<domain>\S+?)\.?\s"
+)
+
+def fake_major_names(university_name, majors=3):
+    return [f"Stub Major {i + 1} at {university_name}" for i in range(majors)]
+
+def fake_general_info(domain):
+    return "\n".join([
+        "--- GENERAL_INFO_START ---",
+        "Minimum GPA: 2.75 minimum cumulative GPA.",
+        "Application Deadlines: Fall: March 1; Spring: October 1.",
+        "Required Tests: None.",
+        f"Transfer Pathways: Articulation agreements listed on {domain}.",
+        "Application Components Required: One essay; LORs not required.",
+        "General Education Certification: IGETC, CSU Breadth.",
+        "Maximum Transferable Units: 70 semester hours.",
+        "Residency Requirements: 30 units in residence.",
+        "--- GENERAL_INFO_START ---",
+    ])
+
+def fake_major(major_name, index):
+    return "\n".join([
+        "--- MAJOR_START ---",
+        f"Major Name: {major_name}",
+        f"Required Lower-Division Courses: MTH {1300 + index}, ENG 1310",
+        "Minimum Grade: C or better",
+        "Major Selectivity: Not impacted",
+        "--- MAJOR_START ---",
+    ])
+
+def fake_report(university_name, domain, majors=3):
+    """Build a small report in the delimited format the real model returns."""
+    blocks = [fake_general_info(domain)]
+    for i, major_name in enumerate(fake_major_names(university_name, majors)):
+        blocks.append(fake_major(major_name, i))
+    return "\n\n".join(blocks)
+
+def fake_report_json(university_name, domain, majors=3):
+    """The same report as fake_report, shaped like main.py's REPORT_SCHEMA."""
+    return {
+        "general_info": {
+            "minimum_gpa": "2.75 minimum cumulative GPA.",
+            "application_deadlines": "Fall: March 1; Spring: October 1.",
+            "required_tests": "None.",
+            "transfer_pathways": f"Articulation agreements listed on {domain}.",
+            "application_components": "One essay; LORs not required.",
+            "ge_certification": "IGETC, CSU Breadth.",
+            "max_transferable_units": "70 semester hours.",
+            "residency_requirements": "30 units in residence.",
+        },
+        "majors": [
+            {"name": major_name, "courses": [f"MTH {1300 + i}", "ENG 1310"],
+             "minimum_grade": "C or better", "selectivity": "Not impacted"}
+            for i, major_name in enumerate(fake_major_names(university_name, majors))
+        ],
+    }
+
+def wants_json(payload):
+    return payload.get("generationConfig", {}).get("responseMimeType") == "application/json"
+
+def usage_metadata(prompt_text, output_text, cached_text=""):
+    """Approximate token counts at four characters per token."""
+    cached_tokens = len(cached_text) // 4
+    prompt_tokens = max(1, len(prompt_text) // 4) + cached_tokens
+    candidate_tokens = max(1, len(output_text) // 4)
+    usage = {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": candidate_tokens,
+        "totalTokenCount": prompt_tokens + candidate_tokens,
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return usage
+
+def system_text(payload):
+    """Concatenate the system instruction parts of a request or cached content."""
+    return "\n".join(part.get("text", "") for part in payload.get("systemInstruction", {}).get("parts", []))
+
+def request_text(payload):
+    """Concatenate the text parts of a generateContent request."""
+    texts = []
+    for content in payload.get("contents", []):
+        for part in content.get("parts", []):
+            texts.append(part.get("text", ""))
+    return "\n".join(texts)
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        body = self._read_body()
+
+        if path.endswith("/files") and path.startswith("/upload/"):
+            return self.upload_file(body)
+        payload = json.loads(body) if body else {}
+        if path.endswith(":generateContent"):
+            return self.generate_content(payload)
+        if path.endswith(":streamGenerateContent"):
+            return self.stream_generate_content(payload)
+        if path.endswith(":batchGenerateContent"):
+            return self.create_batch(payload)
+        if path == "/v1beta/cachedContents":
+            return self.create_cached_content(payload)
+        self._not_found(path)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/v1beta/batches/"):
+            return self.get_batch(path[len("/v1beta/"):])
+        if path.startswith("/download/v1beta/files/") and path.endswith(":download"):
+            return self.download_file(path[len("/download/v1beta/"):-len(":download")])
+        self._not_found(path)
+
+    def _not_found(self, path):
+        self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+    def _report_for(self, payload):
+        prompt = system_text(payload) + request_text(payload)
+        packed = PACKED_QUERY_PATTERN.findall(request_text(payload))
+        if packed:
+            return prompt, "\n".join(
+                f"--- UNIVERSITY_START ---\nNAME: {name}\n" + fake_report(name, domain, self.server.majors)
+                for name, domain in packed
+            )
+        match = OVERVIEW_QUERY_PATTERN.search(prompt + " ")
+        if match:
+            return prompt, "\n".join([fake_general_info(match.group("domain")), "--- MAJOR_LIST_START ---"]
+                                     + fake_major_names(match.group("name"), self.server.majors))
+        match = MAJOR_QUERY_PATTERN.search(prompt + " ")
+        if match:
+            major_name = match.group("major")
+            number = re.search(r"\d+", major_name)
+            return prompt, fake_major(major_name, int(number.group()) - 1 if number else 0)
+        match = QUERY_PATTERN.search(prompt + " ")
+        name, domain = (match.group("name"), match.group("domain")) if match else ("Unknown", "unknown")
+        if wants_json(payload):
+            return prompt, json.dumps(fake_report_json(name, domain, self.server.majors))
+        text = fake_report(name, domain, self.server.majors)
+
+        # A continuation request carries the answer so far as a model turn
+        prior = "".join(part.get("text", "") for content in payload.get("contents", [])
+                        if content.get("role") == "model" for part in content.get("parts", []))
+        if prior:
+            text = text[len(prior.rstrip()):].lstrip("\n")
+        return prompt, text
+
+    def _maybe_truncate(self, text):
+        """Cut a fraction of responses short as if they hit the output limit."""
+        if random.random() >= self.server.truncate_rate:
+            return text, "STOP"
+        return text[:int(len(text) * random.uniform(0.3, 0.9))], "MAX_TOKENS"
+
+    def _maybe_fail(self):
+        """Answer with the configured error status for a fraction of requests."""
+        if random.random() >= self.server.fail_rate:
+            return False
+        status = self.server.fail_status
+        body = json.dumps({"error": {"code": status, "message": "Injected failure",
+                                     "status": "UNAVAILABLE" if status >= 500 else "RESOURCE_EXHAUSTED"}}).encode("utf-8")
+        self.send_response(status)
+        if self.server.retry_after is not None:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def _delay(self):
+        """Wait the base latency, or the slow latency for a fraction of requests."""
+        if self.server.slow_rate and random.random() < self.server.slow_rate:
+            time.sleep(self.server.slow_latency)
+        elif self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _cached_text(self, payload):
+        """
+        Instructions of the cachedContents resource a request refers to, or
+        None after sending an error for an unknown or conflicting reference.
+        """
+        name = payload.get("cachedContent")
+        if not name:
+            return ""
+        cached = self.server.state["caches"].get(name)
+        if cached is None:
+            self._send_json(404, {"error": {"code": 404, "message": f"{name} not found"}})
+            return None
+        if "systemInstruction" in payload or "tools" in payload:
+            self._send_json(400, {"error": {"code": 400, "message":
+                "CachedContent can not be used with systemInstruction or tools"}})
+            return None
+        return system_text(cached)
+
+    def generate_content(self, payload):
+        cached_text = self._cached_text(payload)
+        if cached_text is None:
+            return
+        if wants_json(payload) and "tools" in payload:
+            return self._send_json(400, {"error": {"code": 400, "message":
+                "Tool use with a response mime type: 'application/json' is unsupported"}})
+        if self._maybe_fail():
+            return
+        self._delay()
+
+        prompt, text = self._report_for(payload)
+        text, finish_reason = self._maybe_truncate(text)
+        self._send_json(200, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": finish_reason,
+            }],
+            "usageMetadata": usage_metadata(prompt, text, cached_text),
+        })
+
+    def create_cached_content(self, payload):
+        state = self.server.state
+        with state["lock"]:
+            state["next_id"] += 1
+            name = f"cachedContents/{state['next_id']}"
+            state["caches"][name] = payload
+        self._send_json(200, {"name": name, "model": payload.get("model"),
+                              "usageMetadata": {"totalTokenCount": len(system_text(payload)) // 4}})
+
+    def do_DELETE(self):
+        path = self.path.split("?", 1)[0]
+        name = path[len("/v1beta/"):]
+        with self.server.state["lock"]:
+            removed = self.server.state["caches"].pop(name, None)
+        if removed is None:
+            return self._not_found(path)
+        self._send_json(200, {})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def stream_generate_content(self, payload):
+        """Send the report as server-sent events, a few lines per event."""
+        cached_text = self._cached_text(payload)
+        if cached_text is None:
+            return
+        if self._maybe_fail():
+            return
+        self._delay()
+
+        prompt, text = self._report_for(payload)
+        text, finish_reason = self._maybe_truncate(text)
+        lines = text.splitlines(keepends=True)
+        pieces = ["".join(lines[i:i + 4]) for i in range(0, len(lines), 4)]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i, piece in enumerate(pieces):
+            if i and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+            if i == len(pieces) - 1:
+                chunk["candidates"][0]["finishReason"] = finish_reason
+                chunk["usageMetadata"] = usage_metadata(prompt, text, cached_text)
+            self._write_chunk(f"data: {json.dumps(chunk)}\r\n\r\n".encode("utf-8"))
+        self._write_chunk(b"")
+
+    def upload_file(self, body):
+        """Two-step resumable upload: 'start' hands out a URL, 'upload, finalize' stores the data."""
+        state = self.server.state
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        with state["lock"]:
+            if command == "start":
+                state["next_id"] += 1
+                upload_id = state["next_id"]
+                upload_url = f"{self.server.base_url.rsplit('/', 1)[0]}/upload/v1beta/files?upload_id={upload_id}"
+                self.send_response(200)
+                self.send_header("X-Goog-Upload-URL", upload_url)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            upload_id = self.path.split("upload_id=", 1)[-1]
+            file_name = f"files/upload-{upload_id}"
+            state["files"][file_name] = body
+        self._send_json(200, {"file": {"name": file_name, "sizeBytes": str(len(body))}})
+
+    def create_batch(self, payload):
+        state = self.server.state
+        file_name = payload.get("batch", {}).get("input_config", {}).get("file_name")
+        with state["lock"]:
+            if file_name not in state["files"]:
+                return self._send_json(400, {"error": {"code": 400, "message": f"No such file {file_name}"}})
+            state["next_id"] += 1
+            batch_name = f"batches/{state['next_id']}"
+            state["batches"][batch_name] = {"input": file_name, "polls": 0, "output": None}
+        self._send_json(200, {"name": batch_name, "metadata": {"state": "BATCH_STATE_PENDING"}})
+
+    def get_batch(self, batch_name):
+        """Report a batch as running until it has been polled `batch_polls` times."""
+        state = self.server.state
+        with state["lock"]:
+            batch = state["batches"].get(batch_name)
+            if batch is None:
+                return self._not_found(batch_name)
+            batch["polls"] += 1
+            if batch["polls"] <= self.server.batch_polls:
+                return self._send_json(200, {"name": batch_name, "metadata": {"state": "BATCH_STATE_RUNNING"}})
+
+            if batch["output"] is None:
+                lines = []
+                for line in state["files"][batch["input"]].splitlines():
+                    record = json.loads(line)
+                    prompt, text = self._report_for(record["request"])
+                    lines.append(json.dumps({"key": record["key"], "response": {
+                        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                        "finishReason": "STOP"}],
+                        "usageMetadata": usage_metadata(prompt, text),
+                    }}))
+                batch["output"] = f"files/{batch_name.split('/')[-1]}-results"
+                state["files"][batch["output"]] = ("\n".join(lines) + "\n").encode("utf-8")
+
+        self._send_json(200, {
+            "name": batch_name,
+            "done": True,
+            "metadata": {"state": "BATCH_STATE_SUCCEEDED"},
+            "response": {"responsesFile": batch["output"]},
+        })
+
+    def download_file(self, file_name):
+        data = self.server.state["files"].get(file_name)
+        if data is None:
+            return self._not_found(file_name)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def _self_signed_context():
+    """Create a TLS context with a throwaway self-signed certificate."""
+    cert_dir = tempfile.mkdtemp(prefix="stub-tls-")
+    cert_file = os.path.join(cert_dir, "cert.pem")
+    key_file = os.path.join(cert_dir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key_file, "-out", cert_file],
+        check=True, capture_output=True
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    return context
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0, majors=3, tls=False, verbose=False,
+                      chunk_delay=0.0, batch_polls=2, fail_rate=0.0, fail_status=503, retry_after=None,
+                      slow_rate=0.0, slow_latency=0.0, truncate_rate=0.0):
+    """
+    Start the stand-in server on a background thread and return it.
+    The server's `base_url` attribute is suitable for main.API_BASE.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.majors = majors
+    server.chunk_delay = chunk_delay
+    server.batch_polls = batch_polls
+    server.fail_rate = fail_rate
+    server.fail_status = fail_status
+    server.retry_after = retry_after
+    server.slow_rate = slow_rate
+    server.slow_latency = slow_latency
+    server.truncate_rate = truncate_rate
+    server.state = {"lock": threading.Lock(), "next_id": 0, "files": {}, "batches": {}, "caches": {}}
+    server.verbose = verbose
+
+    scheme = "http"
+    if tls:
+        server.socket = _self_signed_context().wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    server.base_url = f"{scheme}://{host}:{server.server_address[1]}/v1beta"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini REST API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--majors", type=int, default=3, help="Major blocks per generated report")
+    parser.add_argument("--chunk-delay", type=float, default=0.0,
+                        help="Seconds between events of a streamed response")
+    parser.add_argument("--batch-polls", type=int, default=2,
+                        help="Status checks a batch job reports as running before it succeeds")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Fraction of generate requests answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=int, help="Retry-After seconds sent with injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="Fraction of generate requests that wait --slow-latency instead")
+    parser.add_argument("--slow-latency", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="Fraction of generate responses cut short with finishReason MAX_TOKENS")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS with a self-signed certificate")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.latency, args.majors, args.tls, verbose=True,
+                               chunk_delay=args.chunk_delay, batch_polls=args.batch_polls,
+                               fail_rate=args.fail_rate, fail_status=args.fail_status,
+                               retry_after=args.retry_after, slow_rate=args.slow_rate,
+                               slow_latency=args.slow_latency, truncate_rate=args.truncate_rate)
+    print(f"Stub Gemini API listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()